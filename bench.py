@@ -0,0 +1,112 @@
+import sys
+from random import random, seed
+from time import perf_counter
+from matrix import *
+from fraction import Fraction, FractionArray
+import fractions
+import calc
+from calc import Exp, Pol, Var, Con
+
+
+def timeit(f, *args):
+    t = perf_counter()
+    f(*args)
+    return perf_counter() - t
+
+def rand_mat(n, m):
+    return Mat([[random() for _ in range(m)] for _ in range(n)])
+
+
+
+def naive_mul(a, b): # the old Mat.__mul__: a fresh column list for every output cell
+    ar, _ = a.size()
+    _, bc = b.size()
+    return Mat([[sum(i * j for i, j in zip(a.m[r], b.col(c))) for c in range(bc)] for r in range(ar)])
+
+def bench_mul(sizes=None):
+    sizes = sizes or [64, 128, 256]
+    print('matmul       n   naive (s)   blocked (s)   speedup')
+    for n in sizes:
+        a, b = rand_mat(n, n), rand_mat(n, n)
+        t0 = timeit(naive_mul, a, b)
+        t1 = timeit(Mat.__mul__, a, b)
+        print(f'       {n:>6} {t0:>11.3f} {t1:>13.3f} {t0 / t1:>9.1f}x')
+
+
+
+def frac_sum(cls, terms):
+    s = cls(0)
+    for n, d in terms:
+        s = s + cls(n, d)
+    return s
+
+def bench_fraction(sizes=None):
+    sizes = sizes or [1000, 10000, 100000]
+    print('fraction sum     terms   Fraction (terms/s)   fractions.Fraction (terms/s)   FractionArray.sum (terms/s)')
+    for n in sizes:
+        for name, terms in (('1/k', [(1, k % 97 + 1) for k in range(n)]), ('k/1', [(k, 1) for k in range(n)])):
+            t0 = timeit(frac_sum, Fraction, terms)
+            t1 = timeit(frac_sum, fractions.Fraction, terms)
+            t2 = timeit(FractionArray.sum, FractionArray(*zip(*terms)))
+            print(f'   {name:>6} {n:>11} {n / t0:>20.0f} {n / t1:>30.0f} {n / t2:>29.0f}')
+
+
+
+def sample_func():
+    p = Pol({3: 2, 1: -1, 0: 0.5})
+    return Exp(p) * (p + Con(3)) / (Var() * Var() + Con(1)) - Exp(p)
+
+def bench_compile(sizes=None):
+    sizes = sizes or [10000, 100000]
+    f = sample_func()
+    print('calc compile   points   eval (s)   compiled (s)   speedup')
+    for n in sizes:
+        xs = [i / n for i in range(n)]
+        t0 = timeit(lambda: [f.eval(x) for x in xs])
+        g = f.compile()
+        t1 = timeit(lambda: [g(x) for x in xs])
+        print(f'         {n:>10} {t0:>10.3f} {t1:>14.3f} {t0 / t1:>9.1f}x')
+
+
+
+def nodes(f): # distinct subtree objects
+    seen = {}
+    stack = [f]
+    while stack:
+        g = stack.pop()
+        if id(g) in seen: continue
+        seen[id(g)] = g
+        stack += [getattr(g, k) for k in ('f', 'f1', 'f2') if hasattr(g, k)]
+    return len(seen)
+
+def bench_derivative(sizes=None):
+    sizes = sizes or [1, 2, 3, 4, 5]
+    x = Var()
+    f = Exp(x * x) * x / (x + Con(1))
+    xs = [i / 1000 for i in range(1000)]
+    print('nth derivative   n   nodes raw   nodes simplified   eval raw (s)   eval simplified (s)   compiled simplified (s)')
+    for n in sizes:
+        row = []
+        for simplify in (False, True):
+            calc.SIMPLIFY = simplify
+            g = f
+            for _ in range(n):
+                g = g.der()
+            row += [nodes(g), timeit(lambda: [g.eval(v) for v in xs])]
+        calc.SIMPLIFY = True
+        c = g.compile() # shared subtrees are computed once per point
+        row.append(timeit(lambda: [c(v) for v in xs]))
+        print(f'             {n:>4} {row[0]:>11} {row[2]:>18} {row[1]:>14.3f} {row[3]:>21.3f} {row[4]:>25.3f}')
+
+
+
+BENCHES = {'mul': bench_mul, 'fraction': bench_fraction, 'compile': bench_compile, 'derivative': bench_derivative}
+
+if __name__ == '__main__':
+    seed(0)
+    # python bench.py [name] [sizes...], e.g. python bench.py mul 64 128 256 512 1024 (minutes on the naive path)
+    args = sys.argv[1:]
+    names = [args.pop(0)] if args and args[0] in BENCHES else list(BENCHES)
+    sizes = [int(x) for x in args]
+    for name in names:
+        BENCHES[name](sizes)
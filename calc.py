@@ -1,5 +1,18 @@
 from abc import ABC, abstractmethod
-from math import exp
+from itertools import repeat
+from math import exp, isfinite, log
+from operator import add, mul, pow, sub, truediv
+from typing import Callable
+from weakref import WeakValueDictionary
+
+import dual
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SIMPLIFY = True # der() and prim() return simplified, hash-consed trees
 
 
 
@@ -23,9 +36,18 @@ class Func(ABC):
     def __neg__(self) -> 'Func':
         return Mul(Con(-1), self)
 
-    @abstractmethod
     def eval(self, x: float) -> float:
-        pass
+        return self._eval_shared(x, {})
+
+    def _eval_shared(self, x: float, seen: dict):
+        # once per node object in one evaluation, so a hash-consed tree is walked as the DAG it is
+        key = id(self)
+        if key not in seen:
+            seen[key] = self._eval(x, seen)
+        return seen[key]
+
+    def _eval(self, x: float, seen: dict): # this node at x, children through _eval_shared; subclasses override eval or this
+        return self.eval(x)
 
     @abstractmethod
     def der(self) -> 'Func': # derivative
@@ -36,83 +58,247 @@ class Func(ABC):
         pass
 
     def integral(self, a: float, b: float) -> float:
-        p = self.prim()
+        try:
+            p = self.prim()
+        except NotImplementedError: # no symbolic primitive, integrate numerically
+            return quad(self, a, b)[0]
         return p.eval(b) - p.eval(a)
 
+    def eval_der(self, x: float) -> tuple[float, float]: # f(x), f'(x) in one pass over the tree, no der() needed
+        return dual.derivative(self.eval, x)
+
+    def eval_der2(self, x: float) -> tuple[float, float, float]: # f(x), f'(x), f''(x) in one pass
+        return dual.derivative2(self.eval, x)
+
+    def _key(self) -> tuple: # structural identity, equal trees give equal keys; by default every node is its own
+        return ('id', id(self))
+
+    def _expr(self, code: '_Code') -> str: # python expression for this node, children referenced by local name
+        return f'{code.const(self)}.eval(x)' # by default the compiled function calls back into eval
+
+    def _emit(self, code: '_Code') -> str: # local name holding this node's value, shared between equal subtrees
+        key = self._key()
+        if key not in code.names:
+            expr = self._expr(code)
+            name = code.names[key] = f't{len(code.names)}'
+            code.lines.append(f'{name} = {expr}')
+        return code.names[key]
+
+    def compile(self) -> Callable[[float], float]:
+        # one flat python function for the whole tree, same values as eval
+        code = _Code()
+        out = self._emit(code)
+        src = 'def f(x):\n' + ''.join(f'    {line}\n' for line in code.lines) + f'    return {out}\n'
+        exec(src, code.env)
+        return code.env['f']
+
+    def eval_many(self, xs):
+        # each node once over the whole vector: ufuncs for a numpy array, plain loops for anything else
+        if np is not None and isinstance(xs, np.ndarray):
+            ys = self._many_shared(xs.astype(float), {})
+            return ys if isinstance(ys, np.ndarray) else np.full(len(xs), ys, dtype=float)
+        return self._many_shared(list(xs), {})
+
+    def _many_shared(self, xs, seen: dict):
+        key = self._key()
+        if key not in seen:
+            seen[key] = self._many(xs, seen)
+        return seen[key]
+
+    def _many(self, xs, seen: dict): # this node over xs (a list or an ndarray), by default one eval per point
+        ys = [self.eval(x) for x in xs]
+        return ys if isinstance(xs, list) else np.array(ys, dtype=float)
+
+    def simplify(self) -> 'Func':
+        # constant folding, 0 and 1 elimination, Pol nodes merged into one Pol,
+        # and structurally equal subtrees replaced by one shared object
+        if getattr(self, '_simple', False):
+            return self
+        f = self._simplify()
+        f = _NODES.setdefault(f._key(), f)
+        f._simple = True
+        return f
+
+    def _simplify(self) -> 'Func':
+        return self
+
+
+
+_NODES = WeakValueDictionary() # _key() -> the one shared simplified node
+
+def _simplified(f: Func) -> Func:
+    return f.simplify() if SIMPLIFY else f
+
+def _const(f: Func): # value of f if it is a constant, otherwise None
+    if isinstance(f, Pol) and all(e == 0 or c == 0 for e, c in f.pol.items()):
+        return f.coef(0)
+    return None
+
+
+
+class _Code:
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+        self.names: dict[tuple, str] = {}
+        self.env: dict = {'exp': exp, 'log': log}
+
+    def const(self, c) -> str:
+        if type(c) in (int, float) and isfinite(c):
+            return repr(c)
+        name = f'c{len(self.env)}'
+        self.env[name] = c
+        return name
+
 
 
 class Unary(Func):
     def __init__(self, f: Func) -> None:
         self.f = f
 
+    def _key(self) -> tuple:
+        if '_k' not in self.__dict__: # cached, the tree below never changes
+            self._k = (type(self).__name__, self.f._key())
+        return self._k
+
+    def _simplify(self) -> Func:
+        return self._combine(self.f.simplify())
+
+    def _combine(self, f: Func) -> Func:
+        return type(self)(f)
+
 class Binary(Func):
+    op = '' # python operator, for compile
+    fn = None # the same operator as a function, for eval and eval_many
+
     def __init__(self, f1: Func, f2: Func) -> None:
         self.f1 = f1
         self.f2 = f2
 
+    def _key(self) -> tuple:
+        if '_k' not in self.__dict__: # cached, the tree below never changes
+            self._k = (type(self).__name__, self.f1._key(), self.f2._key())
+        return self._k
+
+    def _simplify(self) -> Func:
+        return self._combine(self.f1.simplify(), self.f2.simplify())
+
+    def _combine(self, a: Func, b: Func) -> Func: # a and b already simplified
+        return type(self)(a, b)
+
+    def _expr(self, code: '_Code') -> str:
+        return f'{self.f1._emit(code)} {self.op} {self.f2._emit(code)}'
+
+    def _eval(self, x: float, seen: dict):
+        return self.fn(self.f1._eval_shared(x, seen), self.f2._eval_shared(x, seen))
+
+    def _many(self, xs, seen: dict):
+        a = self.f1._many_shared(xs, seen)
+        b = self.f2._many_shared(xs, seen)
+        if isinstance(xs, list):
+            return list(map(self.fn, a, b))
+        return self.fn(a, b)
+
 
 
 class Add(Binary):
+    op = '+'
+    fn = staticmethod(add)
+
+    def _combine(self, a: Func, b: Func) -> Func:
+        if _const(a) == 0: return b
+        if _const(b) == 0: return a
+        if isinstance(a, Pol) and isinstance(b, Pol): return _pol(a + b)
+        return Add(a, b)
+
     def __repr__(self) -> str:
         return f'({self.f1} + {self.f2})'
 
-    def eval(self, x: float) -> float:
-        return self.f1.eval(x) + self.f2.eval(x)
-
     def der(self) -> Func:
-        return Add(self.f1.der(), self.f2.der())
+        return _simplified(Add(self.f1.der(), self.f2.der()))
 
     def prim(self) -> Func:
-        return Add(self.f1.prim(), self.f2.prim())
+        return _simplified(Add(self.f1.prim(), self.f2.prim()))
 
 class Sub(Binary):
+    op = '-'
+    fn = staticmethod(sub)
+
+    def _combine(self, a: Func, b: Func) -> Func:
+        if _const(b) == 0: return a
+        if a is b: return Con(0) # hash-consed, so equal trees are the same object
+        if isinstance(a, Pol) and isinstance(b, Pol): return _pol(a - b)
+        return Sub(a, b)
+
     def __repr__(self) -> str:
         return f'({self.f1} - {self.f2})'
 
-    def eval(self, x: float) -> float:
-        return self.f1.eval(x) - self.f2.eval(x)
-
     def der(self) -> Func:
-        return Sub(self.f1.der(), self.f2.der())
+        return _simplified(Sub(self.f1.der(), self.f2.der()))
 
     def prim(self) -> Func:
-        return Sub(self.f1.prim(), self.f2.prim())
+        return _simplified(Sub(self.f1.prim(), self.f2.prim()))
 
 class Mul(Binary):
+    op = '*'
+    fn = staticmethod(mul)
+
+    def _combine(self, a: Func, b: Func) -> Func:
+        if _const(a) == 0 or _const(b) == 0: return Con(0)
+        if _const(a) == 1: return b
+        if _const(b) == 1: return a
+        if isinstance(a, Pol) and isinstance(b, Pol): return _pol(a * b)
+        return Mul(a, b)
+
     def __repr__(self) -> str:
         return f'({self.f1} * {self.f2})'
 
-    def eval(self, x: float) -> float:
-        return self.f1.eval(x) * self.f2.eval(x)
-
     def der(self) -> Func:
-        return Add(Mul(self.f1.der(), self.f2), Mul(self.f1, self.f2.der()))
+        return _simplified(Add(Mul(self.f1.der(), self.f2), Mul(self.f1, self.f2.der())))
 
     def prim(self) -> Func:
         raise NotImplementedError
 
 class Div(Binary):
+    op = '/'
+    fn = staticmethod(truediv)
+
+    def _combine(self, a: Func, b: Func) -> Func:
+        c = _const(b)
+        if _const(a) == 0 and c != 0: return Con(0)
+        if c == 1: return a
+        if c is not None and c != 0 and isinstance(a, Pol): return _pol(a * Con(1 / c))
+        return Div(a, b)
+
     def __repr__(self) -> str:
         return f'({self.f1} / {self.f2})'
 
-    def eval(self, x: float) -> float:
-        return self.f1.eval(x) / self.f2.eval(x)
-
     def der(self) -> Func:
-        return Div(Sub(Mul(self.f1.der(), self.f2), Mul(self.f1, self.f2.der())), Mul(self.f2, self.f2))
+        return _simplified(Div(Sub(Mul(self.f1.der(), self.f2), Mul(self.f1, self.f2.der())), Mul(self.f2, self.f2)))
 
     def prim(self) -> Func:
         raise NotImplementedError
 
 class Pow(Binary):
+    op = '**'
+    fn = staticmethod(pow)
+
+    def _combine(self, a: Func, b: Func) -> Func:
+        c = _const(b)
+        if c == 0: return Con(1)
+        if c == 1: return a
+        if c is not None and _const(a) is not None: return Con(_const(a) ** c)
+        if c is not None and c % 1 == 0 and c > 0 and isinstance(a, Pol): return _pol(a ** int(c))
+        return Pow(a, b)
+
     def __repr__(self) -> str:
         return f'({self.f1} ** {self.f2})'
 
-    def eval(self, x: float) -> float:
-        return self.f1.eval(x) ** self.f2.eval(x)
-
     def der(self) -> Func:
-        raise NotImplementedError
+        f, g = self.f1, self.f2
+        if _const(g) is not None: # (f^c)' = c * f^(c-1) * f'
+            return _simplified(Mul(Mul(g, Pow(f, Con(_const(g) - 1))), f.der()))
+        # (f^g)' = f^g * (g' * ln f + g * f' / f)
+        return _simplified(Mul(Pow(f, g), Add(Mul(g.der(), Log(f)), Div(Mul(g, f.der()), f))))
 
     def prim(self) -> Func:
         raise NotImplementedError
@@ -120,14 +306,57 @@ class Pow(Binary):
 
 
 class Exp(Unary):
+
+    def _combine(self, f: Func) -> Func:
+        c = _const(f)
+        if c is not None: return Con(exp(c))
+        return Exp(f)
+
     def __repr__(self) -> str:
         return f'Exp({self.f})'
 
-    def eval(self, x: float) -> float:
-        return exp(self.f.eval(x))
+    def _eval(self, x: float, seen: dict):
+        return dual.exp(self.f._eval_shared(x, seen))
+
+    def _expr(self, code: '_Code') -> str:
+        return f'exp({self.f._emit(code)})'
+
+    def _many(self, xs, seen: dict):
+        a = self.f._many_shared(xs, seen)
+        if isinstance(xs, list):
+            return list(map(exp, a))
+        return np.exp(a)
+
+    def der(self) -> Func:
+        return _simplified(Mul(Exp(self.f), self.f.der()))
+
+    def prim(self) -> Func:
+        raise NotImplementedError
+
+class Log(Unary):
+
+    def _combine(self, f: Func) -> Func:
+        c = _const(f)
+        if c is not None and c > 0: return Con(log(c))
+        return Log(f)
+
+    def __repr__(self) -> str:
+        return f'Log({self.f})'
+
+    def _eval(self, x: float, seen: dict):
+        return dual.log(self.f._eval_shared(x, seen))
+
+    def _expr(self, code: '_Code') -> str:
+        return f'log({self.f._emit(code)})'
+
+    def _many(self, xs, seen: dict):
+        a = self.f._many_shared(xs, seen)
+        if isinstance(xs, list):
+            return list(map(log, a))
+        return np.log(a)
 
     def der(self) -> Func:
-        return Mul(Exp(self.f), self.f.der())
+        return _simplified(Div(self.f.der(), self.f))
 
     def prim(self) -> Func:
         raise NotImplementedError
@@ -136,6 +365,9 @@ class Pol(Func):
     def __init__(self, pol: dict[float, float]) -> None:
         self.pol = pol # key = exponent, value = coefficient
 
+    def _simplify(self) -> 'Pol':
+        return _pol(self)
+
     def coef(self, exp: int) -> float: # if not sure if exp exists in dict
         if exp in self.pol: return self.pol[exp]
         return 0
@@ -156,8 +388,77 @@ class Pol(Func):
             result[e + 1] = c / (e + 1)
         return Pol(result)
     
+    def _terms(self) -> list: # nonzero (exponent, coefficient) from the top down, re-sorted only after pol changes
+        if self.__dict__.get('_src') != self.pol:
+            self._src = dict(self.pol)
+            self._desc = sorted(((e, c) for e, c in self.pol.items() if c != 0), reverse=True)
+            self._plain = all(type(e) == int and e >= 0 for e, _ in self._desc)
+            self._horner = None # every coefficient from the top down, zeros included, when that is not much longer
+            if self._plain and self._desc and self._desc[0][0] <= 2 * len(self._desc) + 8:
+                self._horner = [self.coef(e) for e in range(self._desc[0][0], -1, -1)]
+        return self._desc
+
+    def _eval(self, x: float, seen: dict):
+        return self.eval(x)
+
     def eval(self, x: float) -> float:
-        return sum(self.pol[e] * x**e for e in self.pol)
+        terms = self._terms()
+        if not self._plain:
+            return sum(c * x**e for e, c in terms)
+        r = 0
+        if self._horner is not None:
+            for c in self._horner:
+                r = r * x + c
+            return r
+        prev = terms[0][0] if terms else 0
+        for e, c in terms: # horner, a gap between exponents is one power of x
+            g = prev - e
+            r = (r * x if g == 1 else r * x**g) + c
+            prev = e
+        return r * x**prev if prev else r
+
+    def _key(self) -> tuple:
+        return ('Pol', tuple(sorted((e, c) for e, c in self.pol.items() if c != 0)))
+
+    def _expr(self, code: '_Code') -> str:
+        terms = sorted((e, c) for e, c in self.pol.items() if c != 0)
+        if not terms:
+            return '0'
+        if any(type(e) != int or e < 0 for e, _ in terms): # not a plain polynomial, term by term
+            return ' + '.join(f'{code.const(c)} * x ** {code.const(e)}' for e, c in terms)
+        # horner from the highest exponent down, gaps between exponents become one power of x
+        e, c = terms[-1]
+        expr = code.const(c)
+        for e2, c2 in reversed(terms[:-1]):
+            expr = f'({expr}) * {_power(e - e2)} + {code.const(c2)}'
+            e = e2
+        return f'({expr}) * {_power(e)}' if e else expr
+
+    def _many(self, xs, seen: dict):
+        # horner over the whole vector: one pass per term instead of one python loop per point
+        terms = self._terms()
+        if isinstance(xs, list):
+            if not self._plain:
+                return [self.eval(x) for x in xs]
+            r = [0] * len(xs)
+            if self._horner is not None:
+                for c in self._horner:
+                    r = list(map(add, map(mul, r, xs), repeat(c)))
+                return r
+            prev = terms[0][0] if terms else 0
+            for e, c in terms:
+                g = prev - e
+                r = list(map(add, map(mul, r, xs if g == 1 else [x**g for x in xs]), repeat(c)))
+                prev = e
+            return list(map(mul, r, [x**prev for x in xs])) if prev else r
+        if not self._plain:
+            return sum(c * xs**e for e, c in terms)
+        r = 0 * xs
+        prev = terms[0][0] if terms else 0
+        for e, c in terms:
+            r = r * xs**(prev - e) + c
+            prev = e
+        return r * xs**prev
 
     def __str__(self) -> str:
         result = ''
@@ -172,6 +473,9 @@ class Pol(Func):
     def __mul__(self, other):
         if not isinstance(other, Pol):
             return super().__mul__(other)
+        a, b = _dense(self), _dense(other)
+        if a is not None and b is not None:
+            return Pol({e: c for e, c in enumerate(_conv(a, b)) if c != 0})
         result = {}
         for e1, c1 in self.pol.items():
             for e2, c2 in other.pol.items():
@@ -202,12 +506,107 @@ class Pol(Func):
     def __pow__(self, other):
         if not isinstance(other, int):
             return super().__pow__(other)
+        if other < 0:
+            return super().__pow__(Con(other))
         result = Pol({0: 1})
-        for _ in range(other):
-            result *= self
+        base = self
+        while other: # square and multiply
+            if other & 1:
+                result *= base
+            other >>= 1
+            if other:
+                base *= base
         return result
 
 
+def _power(e: int) -> str:
+    return 'x' if e == 1 else f'x ** {e}'
+
+
+def _pol(p: Pol) -> Pol: # a plain Pol without zero terms
+    return Pol({e: c for e, c in p.pol.items() if c != 0} or {0: 0})
+
+
+KARATSUBA_MIN = 32 # shorter factors use the schoolbook product, longer int ones kronecker substitution
+FFT_MIN = 256 # float coefficients from this length on go through numpy
+
+def _dense(p: Pol): # coefficients indexed by exponent, None unless the exponents are small non-negative ints
+    if not p.pol or not all(type(e) == int and e >= 0 for e in p.pol):
+        return None
+    top = max(p.pol)
+    if top > 4 * len(p.pol) + 32:
+        return None
+    a = [0] * (top + 1)
+    for e, c in p.pol.items():
+        a[e] = c
+    return a
+
+def _schoolbook(a: list, b: list) -> list:
+    out = [0] * (len(a) + len(b) - 1)
+    n = len(b)
+    for i, c in enumerate(a):
+        if c == 0: continue
+        out[i:i + n] = map(add, out[i:i + n], map(mul, b, repeat(c)))
+    return out
+
+def _add_into(out: list, a: list, shift: int) -> None:
+    out[shift:shift + len(a)] = map(add, out[shift:shift + len(a)], a)
+
+def _karatsuba(a: list, b: list) -> list:
+    if len(a) < len(b):
+        a, b = b, a
+    if len(b) < KARATSUBA_MIN:
+        return _schoolbook(a, b)
+    m = len(a) // 2
+    out = [0] * (len(a) + len(b) - 1)
+    if len(b) <= m: # lopsided: split only the long factor
+        _add_into(out, _karatsuba(a[:m], b), 0)
+        _add_into(out, _karatsuba(a[m:], b), m)
+        return out
+    a0, a1, b0, b1 = a[:m], a[m:], b[:m], b[m:]
+    z0 = _karatsuba(a0, b0)
+    z2 = _karatsuba(a1, b1)
+    s = [0] * max(len(a0), len(a1))
+    t = [0] * max(len(b0), len(b1))
+    _add_into(s, a0, 0); _add_into(s, a1, 0)
+    _add_into(t, b0, 0); _add_into(t, b1, 0)
+    z1 = _karatsuba(s, t)
+    _add_into(z1, [-c for c in z0], 0)
+    _add_into(z1, [-c for c in z2], 0)
+    _add_into(out, z0, 0)
+    _add_into(out, z1, m)
+    _add_into(out, z2, 2 * m)
+    return out
+
+def _kronecker(a: list, b: list) -> list:
+    # integer coefficients: pack both into one big int each and let the C-level big-int product do the work
+    n = len(a) + len(b) - 1
+    ma, mb = max(map(abs, a)), max(map(abs, b))
+    bound = max(min(len(a), len(b)) * ma * mb, ma, mb) # wide enough for the product and for packing each factor
+    w = (bound.bit_length() + 2 + 7) // 8 # bytes per coefficient, with room for the sign
+
+    def pack(c: list) -> int:
+        pos = b''.join(max(x, 0).to_bytes(w, 'little') for x in c)
+        neg = b''.join(max(-x, 0).to_bytes(w, 'little') for x in c)
+        return int.from_bytes(pos, 'little') - int.from_bytes(neg, 'little')
+
+    half = 1 << (8 * w - 1) # added to every coefficient so all of them unpack as non-negative
+    off = int.from_bytes(half.to_bytes(w, 'little') * n, 'little')
+    raw = (pack(a) * pack(b) + off).to_bytes(w * n, 'little')
+    return [int.from_bytes(raw[i * w:(i + 1) * w], 'little') - half for i in range(n)]
+
+def _conv(a: list, b: list) -> list: # coefficients of the product of two dense polynomials
+    if min(len(a), len(b)) >= KARATSUBA_MIN and all(type(c) == int for c in a + b):
+        return _kronecker(a, b)
+    if np is not None and min(len(a), len(b)) >= FFT_MIN and all(type(c) in (int, float) and abs(c) < 2**53 for c in a + b) \
+            and any(type(c) == float for c in a + b): # floats only, exact integer products stay in python
+        n = len(a) + len(b) - 1
+        size = 1 << (n - 1).bit_length()
+        c = np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)[:n]
+        return c.tolist()
+    return _karatsuba(a, b)
+
+
 class Con(Pol):
     def __init__(self, c: float) -> None:
         super().__init__({0: c})
@@ -217,3 +616,77 @@ class Var(Pol):
     def __init__(self) -> None:
         super().__init__({1: 1})
 
+
+
+# gauss-kronrod 7-15: kronrod nodes on [-1, 1], every other one (odd positions) is also a gauss node
+_XK = [0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+       0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+       0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+       0.207784955007898467600689403773245, 0.0]
+_WK = [0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+       0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+       0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+       0.204432940075298892414161999234649, 0.209482141084727828012999174891714]
+_WG = [0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+       0.381830050505118944950369775488975, 0.417959183673469387755102040816327]
+_NODES_GK = [-x for x in _XK] + _XK[-2::-1]
+_WEIGHTS_K = _WK + _WK[-2::-1]
+_WEIGHTS_G = [0.0, _WG[0], 0.0, _WG[1], 0.0, _WG[2], 0.0, _WG[3], 0.0, _WG[2], 0.0, _WG[1], 0.0, _WG[0], 0.0]
+
+def _change_of_variables(a: float, b: float): # maps t in [lo, hi] onto [a, b], returns lo, hi, x(t), dx/dt
+    inf = float('inf')
+    if a == -inf and b == inf:
+        return -1.0, 1.0, lambda t: t / (1 - t * t), lambda t: (1 + t * t) / (1 - t * t)**2
+    if b == inf:
+        return 0.0, 1.0, lambda t: a + t / (1 - t), lambda t: 1 / (1 - t)**2
+    if a == -inf:
+        return 0.0, 1.0, lambda t: b - (1 - t) / t, lambda t: 1 / (t * t)
+    return a, b, lambda t: t, lambda t: 1.0
+
+def _gk(f: Func, todo: list, x, dx) -> list: # (kronrod, |kronrod - gauss|) per interval, one eval_many call
+    ts = [(l + r) / 2 + (r - l) / 2 * u for l, r in todo for u in _NODES_GK]
+    ys = f.eval_many([x(t) for t in ts])
+    out = []
+    for i, (l, r) in enumerate(todo):
+        h = (r - l) / 2
+        gs = [y * dx(t) for y, t in zip(ys[15 * i:15 * i + 15], ts[15 * i:15 * i + 15])]
+        k = h * sum(map(mul, _WEIGHTS_K, gs))
+        out.append((k, abs(k - h * sum(map(mul, _WEIGHTS_G, gs)))))
+    return out
+
+def quad(f: Func, a: float, b: float, tol: float = 1e-10, max_rounds: int = 50,
+         rtol: float = 1e-10, max_evals: int = 200000) -> tuple[float, float]:
+    # adaptive gauss-kronrod, infinite bounds by change of variables. every round evaluates all
+    # unfinished intervals in one batch. an interval is done within its share of tol or within rtol
+    # of its own value; once max_evals would be exceeded the open intervals keep their parent's estimate.
+    # returns the integral and an error estimate
+    if a == b:
+        return 0.0, 0.0
+    if a > b:
+        v, e = quad(f, b, a, tol, max_rounds, rtol, max_evals)
+        return -v, e
+    lo, hi, x, dx = _change_of_variables(a, b)
+    todo = [(lo, hi)]
+    parent = [None] # (value, error) of each open interval from the round before, halved
+    total = err = 0.0
+    evals = 0
+    for rnd in range(max_rounds):
+        if evals and evals + 15 * len(todo) > max_evals: # out of budget
+            total += sum(k for k, _ in parent)
+            err += sum(e for _, e in parent)
+            break
+        evals += 15 * len(todo)
+        again, halves = [], []
+        for (l, r), (k, e) in zip(todo, _gk(f, todo, x, dx)):
+            # intervals share the tolerance by width; out of rounds, the last estimates are kept
+            if e <= max(tol * (r - l) / (hi - lo), rtol * abs(k)) or r - l < 1e-15 * (hi - lo) or rnd == max_rounds - 1:
+                total += k
+                err += e
+            else:
+                m = (l + r) / 2
+                again += [(l, m), (m, r)]
+                halves += [(k / 2, e / 2)] * 2
+        if not again:
+            break
+        todo, parent = again, halves
+    return total, err
@@ -0,0 +1,22 @@
+# regression checks, run with python checks.py; silent when everything holds
+from other import Polynom
+
+
+def close(xs, ys, tol=1e-9):
+    return len(xs) == len(ys) and all(abs(x - y) <= tol * max(1, abs(y)) for x, y in zip(xs, ys))
+
+def lin(r): # x - r
+    return Polynom({1: 1, 0: -r})
+
+
+# real roots of high multiplicity
+assert close((lin(1.5)**3).zero(), [1.5, 1.5, 1.5])
+assert close((lin(2)**3 * lin(-1)).zero(), [-1, 2, 2, 2])
+assert close([(lin(1.5)**4).min()], [1.5])
+
+# roots near, but not at, an integer
+assert close((lin(2) * lin(2.25) * lin(1)).zero(), [1, 2, 2.25])
+assert close((lin(2) * lin(2.4) * lin(-5)).zero(), [-5, 2, 2.4])
+
+# a real root next to a complex pair
+assert close((lin(1) * Polynom({2: 1, 1: -2, 0: 1 + 2.5e-5})).zero(), [1])
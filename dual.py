@@ -0,0 +1,200 @@
+import math
+
+
+
+class Dual: # a + b·ε with ε² = 0: f(Dual(x, 1)) carries f(x) in a and f'(x) in b
+    __slots__ = ('a', 'b')
+
+    def __init__(self, a, b=0):
+        self.a = a
+        self.b = b
+
+    def __repr__(self):
+        return f'Dual({self.a}, {self.b})'
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.a + other.a, self.b + other.b)
+        return Dual(self.a + other, self.b)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __sub__(self, other):
+        return self + -other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __neg__(self):
+        return Dual(-self.a, -self.b)
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.a * other.a, self.a * other.b + self.b * other.a)
+        return Dual(self.a * other, self.b * other)
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.a / other.a, (self.b * other.a - self.a * other.b) / (other.a * other.a))
+        return Dual(self.a / other, self.b / other)
+
+    def __rtruediv__(self, other):
+        return Dual(other / self.a, -other * self.b / (self.a * self.a))
+
+    def __pow__(self, other):
+        if isinstance(other, Dual) and other.b == 0: # a constant exponent, no log needed (self may be <= 0)
+            other = other.a
+        if isinstance(other, (Dual, HyperDual)):
+            return exp(other * log(self))
+        if other == 0:
+            return Dual(1, 0)
+        return Dual(self.a**other, other * self.a**(other - 1) * self.b)
+
+    def __rpow__(self, other):
+        return exp(self * math.log(other))
+
+    def __abs__(self):
+        return -self if self.a < 0 else self
+
+    # ordering by value, so comparisons in root finders keep working
+    def __lt__(self, other):
+        return self.a < (other.a if isinstance(other, Dual) else other)
+
+    def __le__(self, other):
+        return self.a <= (other.a if isinstance(other, Dual) else other)
+
+    def __gt__(self, other):
+        return self.a > (other.a if isinstance(other, Dual) else other)
+
+    def __ge__(self, other):
+        return self.a >= (other.a if isinstance(other, Dual) else other)
+
+
+
+class HyperDual: # a + b·ε1 + c·ε2 + d·ε1ε2, ε1² = ε2² = 0: f(HyperDual(x, 1, 1)) carries f, f', f', f''
+    __slots__ = ('a', 'b', 'c', 'd')
+
+    def __init__(self, a, b=0, c=0, d=0):
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+
+    def __repr__(self):
+        return f'HyperDual({self.a}, {self.b}, {self.c}, {self.d})'
+
+    def __add__(self, other):
+        if isinstance(other, HyperDual):
+            return HyperDual(self.a + other.a, self.b + other.b, self.c + other.c, self.d + other.d)
+        return HyperDual(self.a + other, self.b, self.c, self.d)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __sub__(self, other):
+        return self + -other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __neg__(self):
+        return HyperDual(-self.a, -self.b, -self.c, -self.d)
+
+    def __mul__(self, other):
+        if isinstance(other, HyperDual):
+            return HyperDual(self.a * other.a, self.a * other.b + self.b * other.a, self.a * other.c + self.c * other.a,
+                             self.a * other.d + self.b * other.c + self.c * other.b + self.d * other.a)
+        return HyperDual(self.a * other, self.b * other, self.c * other, self.d * other)
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __truediv__(self, other):
+        if isinstance(other, HyperDual):
+            return self * other.inv()
+        return HyperDual(self.a / other, self.b / other, self.c / other, self.d / other)
+
+    def __rtruediv__(self, other):
+        return self.inv() * other
+
+    def inv(self):
+        a = self.a
+        return _chain(self, 1 / a, -1 / (a * a), 2 / (a * a * a))
+
+    def __pow__(self, other):
+        if isinstance(other, HyperDual) and other.b == other.c == other.d == 0:
+            other = other.a
+        if isinstance(other, (Dual, HyperDual)):
+            return exp(other * log(self))
+        if other == 0:
+            return HyperDual(1)
+        a = self.a
+        return _chain(self, a**other, other * a**(other - 1), other * (other - 1) * a**(other - 2) if other != 1 else 0)
+
+    def __rpow__(self, other):
+        return exp(self * math.log(other))
+
+    def __abs__(self):
+        return -self if self.a < 0 else self
+
+    def __lt__(self, other):
+        return self.a < (other.a if isinstance(other, HyperDual) else other)
+
+    def __le__(self, other):
+        return self.a <= (other.a if isinstance(other, HyperDual) else other)
+
+    def __gt__(self, other):
+        return self.a > (other.a if isinstance(other, HyperDual) else other)
+
+    def __ge__(self, other):
+        return self.a >= (other.a if isinstance(other, HyperDual) else other)
+
+
+
+def _chain(x, f0, f1, f2): # g(x) for a dual x, given g, g' and g'' at its real part
+    if isinstance(x, HyperDual):
+        return HyperDual(f0, f1 * x.b, f1 * x.c, f1 * x.d + f2 * x.b * x.c)
+    return Dual(f0, f1 * x.b)
+
+# drop-in replacements for the math functions that also accept Dual and HyperDual
+
+def exp(x):
+    if not isinstance(x, (Dual, HyperDual)):
+        return math.exp(x)
+    v = exp(x.a) # x.a is itself dual when derivatives are nested
+    return _chain(x, v, v, v)
+
+def log(x):
+    if not isinstance(x, (Dual, HyperDual)):
+        return math.log(x)
+    return _chain(x, log(x.a), 1 / x.a, -1 / (x.a * x.a))
+
+def sqrt(x):
+    if not isinstance(x, (Dual, HyperDual)):
+        return math.sqrt(x)
+    v = sqrt(x.a)
+    return _chain(x, v, 0.5 / v, -0.25 / (v * x.a))
+
+def sin(x):
+    if not isinstance(x, (Dual, HyperDual)):
+        return math.sin(x)
+    return _chain(x, sin(x.a), cos(x.a), -sin(x.a))
+
+def cos(x):
+    if not isinstance(x, (Dual, HyperDual)):
+        return math.cos(x)
+    return _chain(x, cos(x.a), -sin(x.a), -cos(x.a))
+
+
+
+def derivative(f, x): # f(x) and f'(x) in one evaluation
+    y = f(Dual(x, 1))
+    return (y.a, y.b) if isinstance(y, Dual) else (y, 0)
+
+def derivative2(f, x): # f(x), f'(x) and f''(x) in one evaluation
+    y = f(HyperDual(x, 1, 1))
+    return (y.a, y.b, y.d) if isinstance(y, HyperDual) else (y, 0, 0)
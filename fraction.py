@@ -1,26 +1,85 @@
+from array import array
+from itertools import repeat
+from math import gcd, isfinite, lcm
+from operator import mul
+from sys import hash_info
 
-def gcd(a, b):
-    # a = q * b + r
-    if b == 0: return a
-    q = a // b
-    r = a - q * b
-    return gcd(b, r)
+
+
+def _approx(n, d, max_den, tol):
+    # continued fraction expansion of n/d (a walk down the Stern-Brocot tree), O(log d) steps
+    if max_den < 1:
+        raise ValueError('max_denominator < 1')
+    if d <= max_den and tol == 0:
+        return Fraction(n, d)
+    p0, q0, p1, q1 = 0, 1, 1, 0
+    a, b = n, d
+    while b:
+        k = a // b
+        q2 = q0 + k * q1
+        if q2 > max_den:
+            break
+        p0, q0, p1, q1 = p1, q1, p0 + k * p1, q2
+        a, b = b, a - k * b
+        if abs(p1 * d - n * q1) <= tol * q1 * d:
+            return Fraction(p1, q1)
+    else:
+        return Fraction(p1, q1)
+    # between the last convergent and the best semiconvergent below max_den, take the closer one
+    k = (max_den - q0) // q1
+    p2, q2 = p0 + k * p1, q0 + k * q1
+    if abs(p2 * d - n * q2) * q1 < abs(p1 * d - n * q1) * q2:
+        return Fraction(p2, q2)
+    return Fraction(p1, q1)
 
 
 
 class Fraction:
+    __slots__ = ('num', 'den')
+
     def __init__(self, num, den=1):
         if type(num) != int or type(den) != int:
             raise Exception("Not ints")
-        d = gcd(num, den)
-        self.num = int(num / d)
-        self.den = int(den / d)
+        if den == 0:
+            raise ZeroDivisionError('zero denominator')
+        if den < 0:
+            num, den = -num, -den
+        if den != 1:
+            d = gcd(num, den)
+            if d != 1:
+                num //= d
+                den //= d
+        self.num = num
+        self.den = den
+
+    @staticmethod
+    def _new(num, den): # num/den already reduced with den > 0, skips the checks
+        f = object.__new__(Fraction)
+        f.num = num
+        f.den = den
+        return f
+
+    @staticmethod
+    def from_float(x, max_denominator=1000000, tol=0.0):
+        # closest fraction with den <= max_denominator, or the first convergent within tol of x
+        if type(x) == int:
+            return Fraction._new(x, 1)
+        n, d = float(x).as_integer_ratio() # ValueError / OverflowError for nan / inf
+        return _approx(n, d, max_denominator, tol)
 
     @staticmethod
-    def from_float(n):
-        for i in range(1, 100000):
-            if (n * i) % 1 == 0:
-                return Fraction(n * i, i)
+    def from_floats(xs, max_denominator=1000000, tol=0.0): # batch from_float, repeated values converted once
+        seen = {}
+        out = []
+        for x in xs:
+            f = seen.get(x)
+            if f is None:
+                f = seen[x] = Fraction.from_float(x, max_denominator, tol)
+            out.append(f)
+        return out
+
+    def limit_denominator(self, max_denominator=1000000):
+        return _approx(self.num, self.den, max_denominator, 0.0)
 
     def __str__(self):
         return str(self.num) if self.den == 1 else f'({self.num}/{self.den})'
@@ -32,9 +91,24 @@ class Fraction:
         return Fraction(self.num, self.den)
     
     def __add__(self, other):
-        if type(other) == int:
-            other = Fraction(other)
-        return Fraction(self.num * other.den + other.num * self.den, self.den * other.den)
+        if type(other) == int: # integer denominator: the result is already reduced
+            return Fraction._new(self.num + other * self.den, self.den)
+        if type(other) == float:
+            return self.eval() + other
+        if type(other) != Fraction: # FractionArray and the like handle it from their side
+            return NotImplemented
+        na, da, nb, db = self.num, self.den, other.num, other.den
+        if da == 1 and db == 1:
+            return Fraction._new(na + nb, 1)
+        g = gcd(da, db)
+        if g == 1: # coprime denominators: no common factor can appear
+            return Fraction._new(na * db + nb * da, da * db)
+        s = da // g
+        t = na * (db // g) + nb * s
+        g2 = gcd(t, g)
+        if g2 == 1:
+            return Fraction._new(t, s * db)
+        return Fraction._new(t // g2, s * (db // g2))
     
     def __radd__(self, other):
         return self + other
@@ -47,8 +121,21 @@ class Fraction:
     
     def __mul__(self, other):
         if type(other) == int:
-            other = Fraction(other)
-        return Fraction(self.num * other.num, self.den * other.den)
+            other = Fraction._new(other, 1)
+        elif type(other) == float:
+            return self.eval() * other
+        elif type(other) != Fraction:
+            return NotImplemented
+        na, da, nb, db = self.num, self.den, other.num, other.den
+        g1 = gcd(na, db) # cross-cancel before multiplying keeps the products small
+        if g1 > 1:
+            na //= g1
+            db //= g1
+        g2 = gcd(nb, da)
+        if g2 > 1:
+            nb //= g2
+            da //= g2
+        return Fraction._new(na * nb, da * db)
 
     def __rmul__(self, other):
         return self * other
@@ -56,6 +143,10 @@ class Fraction:
     def __truediv__(self, other):
         if type(other) == int:
             other = Fraction(other)
+        elif type(other) == float:
+            return self.eval() / other
+        elif type(other) != Fraction:
+            return NotImplemented
         return self * other.inv()
     
     def __rtruediv__(self, other):
@@ -65,8 +156,196 @@ class Fraction:
         return Fraction(self.num ** other, self.den ** other)
     
     def __neg__(self):
-        return Fraction(-self.num, self.den)
+        return Fraction._new(-self.num, self.den)
     
     def inv(self):
         return Fraction(self.den, self.num)
-    
+
+    def __abs__(self):
+        return Fraction._new(abs(self.num), self.den)
+
+    def _cmp(self, other): # sign of self - other, NotImplemented for other types
+        if isinstance(other, float):
+            if not isfinite(other):
+                d = self.eval() - other
+                return (d > 0) - (d < 0)
+            other = Fraction._new(*other.as_integer_ratio()) # exact, so equality agrees with hashing
+        elif isinstance(other, int): # bool included
+            other = Fraction._new(int(other), 1)
+        elif not isinstance(other, Fraction):
+            return NotImplemented
+        d = self.num * other.den - other.num * self.den
+        return (d > 0) - (d < 0)
+
+    def __eq__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c == 0
+
+    def __lt__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c < 0
+
+    def __le__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c <= 0
+
+    def __gt__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c > 0
+
+    def __ge__(self, other):
+        c = self._cmp(other)
+        return c if c is NotImplemented else c >= 0
+
+    def __hash__(self): # same as hash() of an equal int or float, python's rule for rationals
+        if self.den == 1:
+            return hash(self.num)
+        try:
+            inv = pow(self.den, -1, hash_info.modulus)
+        except ValueError: # den is a multiple of the modulus
+            h = hash_info.inf
+        else:
+            h = hash(hash(abs(self.num)) * inv)
+        h = h if self.num >= 0 else -h
+        return -2 if h == -1 else h
+
+
+
+def _ints(values): # array('q') while everything fits in 64 bits, a list of python ints otherwise
+    values = values if isinstance(values, list) else list(values)
+    try:
+        return array('q', values)
+    except OverflowError:
+        return values
+
+class FractionArray: # numerators and denominators in two parallel integer arrays, reduced only on demand
+    def __init__(self, nums, dens=None):
+        nums = list(nums)
+        dens = [1] * len(nums) if dens is None else list(dens)
+        if len(nums) != len(dens):
+            raise ValueError('len(nums) != len(dens)')
+        for i, d in enumerate(dens):
+            if d == 0:
+                raise ZeroDivisionError('zero denominator')
+            if d < 0:
+                nums[i], dens[i] = -nums[i], -d
+        self.nums = _ints(nums)
+        self.dens = _ints(dens)
+
+    @staticmethod
+    def _wrap(nums, dens): # dens already positive
+        a = FractionArray.__new__(FractionArray)
+        a.nums = _ints(nums)
+        a.dens = _ints(dens)
+        return a
+
+    @staticmethod
+    def from_list(fs):
+        fs = [Fraction._new(f, 1) if type(f) == int else f for f in fs]
+        return FractionArray._wrap([f.num for f in fs], [f.den for f in fs])
+
+    def to_list(self):
+        return [Fraction(n, d) for n, d in zip(self.nums, self.dens)]
+
+    def reduced(self):
+        ns, ds = [], []
+        for n, d in zip(self.nums, self.dens):
+            g = gcd(n, d)
+            ns.append(n // g)
+            ds.append(d // g)
+        return FractionArray._wrap(ns, ds)
+
+    def __len__(self):
+        return len(self.nums)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return FractionArray._wrap(self.nums[i], self.dens[i])
+        return Fraction(self.nums[i], self.dens[i])
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __str__(self):
+        return f"[{' '.join(str(f) for f in self)}]"
+
+    def _pairs(self, other): # the other operand as parallel (nums, dens), None for unsupported types
+        if isinstance(other, FractionArray):
+            if len(other) != len(self):
+                raise ValueError('len(a) != len(b)')
+            return other.nums, other.dens
+        if isinstance(other, int):
+            other = Fraction._new(int(other), 1)
+        elif not isinstance(other, Fraction): # floats included, the array stays exact
+            return None
+        return repeat(other.num, len(self)), repeat(other.den, len(self))
+
+    def __add__(self, other):
+        pairs = self._pairs(other)
+        if pairs is None:
+            return NotImplemented
+        on, od = pairs
+        ns, ds = [], []
+        for n1, d1, n2, d2 in zip(self.nums, self.dens, on, od):
+            if d1 == d2:
+                ns.append(n1 + n2)
+                ds.append(d1)
+            else:
+                ns.append(n1 * d2 + n2 * d1)
+                ds.append(d1 * d2)
+        return FractionArray._wrap(ns, ds)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __neg__(self):
+        return FractionArray._wrap([-n for n in self.nums], self.dens)
+
+    def __sub__(self, other):
+        return self + -other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        pairs = self._pairs(other)
+        if pairs is None:
+            return NotImplemented
+        on, od = pairs
+        return FractionArray._wrap(list(map(mul, self.nums, on)), list(map(mul, self.dens, od)))
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __truediv__(self, other):
+        pairs = self._pairs(other)
+        if pairs is None:
+            return NotImplemented
+        on, od = pairs
+        ns, ds = [], []
+        for n1, d1, n2, d2 in zip(self.nums, self.dens, on, od):
+            if n2 == 0:
+                raise ZeroDivisionError('division by zero')
+            if n2 < 0:
+                n2, d2 = -n2, -d2
+            ns.append(n1 * d2)
+            ds.append(d1 * n2)
+        return FractionArray._wrap(ns, ds)
+
+    def sum(self):
+        return _sum_over(self.nums, self.dens)
+
+    def dot(self, other):
+        pairs = self._pairs(other)
+        if pairs is None:
+            raise TypeError(f'cannot take dot with {type(other).__name__}')
+        on, od = pairs
+        return _sum_over(map(mul, self.nums, on), map(mul, self.dens, od))
+
+def _sum_over(nums, dens):
+    # integer sums per distinct denominator, then one common denominator and a single reduction
+    by_den = {}
+    for n, d in zip(nums, dens):
+        by_den[d] = by_den.get(d, 0) + n
+    l = lcm(*by_den) if by_den else 1
+    return Fraction(sum(n * (l // d) for d, n in by_den.items()), l)
@@ -1,34 +1,267 @@
+from array import array
+from cmath import sqrt as csqrt
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+from math import lcm, prod
+from multiprocessing.shared_memory import SharedMemory
+from operator import add, mul, sub
+from weakref import WeakKeyDictionary
+from fraction import Fraction
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+
+_FLOATS = (float,) if np is None else (float, np.floating)
+_REALS = (int, float) if np is None else (int, float, np.integer, np.floating)
+
+def _pack(values):
+    # row-major storage: array('d') for real entries with at least one float among them, a plain list
+    # otherwise, so int matrices keep exact python ints and Fractions and the like work unchanged
+    if isinstance(values, array):
+        return values
+    if not isinstance(values, list):
+        values = list(values)
+    if any(isinstance(x, _FLOATS) for x in values) and all(isinstance(x, _REALS) for x in values):
+        return array('d', values)
+    return values
+
+def _zip(op, a, b):
+    if isinstance(a, array) and isinstance(b, array):
+        return array('d', map(op, a, b))
+    return _pack(map(op, a, b))
+
+def _scale(a, s):
+    if isinstance(a, array) and isinstance(s, _REALS):
+        return array('d', map(mul, a, repeat(s)))
+    return _pack(map(mul, a, repeat(s)))
+
+
+
+NUMPY_MIN_SIZE = 4096 # entries; smaller matrices stay on the pure python path
+
+def set_numpy_threshold(n):
+    # n = None turns the numpy backend off
+    global NUMPY_MIN_SIZE
+    NUMPY_MIN_SIZE = n
+
+def _use_np(*ms):
+    if np is None or NUMPY_MIN_SIZE is None:
+        return False
+    return all(isinstance(m.data, array) for m in ms) and max(m.rows * m.cols for m in ms) >= NUMPY_MIN_SIZE
+
+def _to_np(m): # zero-copy view of the buffer
+    return np.frombuffer(m.data, dtype=np.float64).reshape(m.rows, m.cols)
+
+def _from_np(a):
+    a = np.ascontiguousarray(a, dtype=np.float64)
+    return Mat._wrap(array('d', a.tobytes()), *a.shape)
+
+
+
+PARALLEL_WORKERS = None # worker processes for Mat.__mul__ and inversion, None keeps them on one core
+PARALLEL_MIN_BLOCK = 64 # rows (or columns of the inverse) per task
+
+def set_parallel(workers, min_block=64):
+    global PARALLEL_WORKERS, PARALLEL_MIN_BLOCK
+    PARALLEL_WORKERS = workers
+    PARALLEL_MIN_BLOCK = min_block
+
+def _use_parallel(n, *ms):
+    if PARALLEL_WORKERS is None or n < 2 * PARALLEL_MIN_BLOCK:
+        return False
+    return all(isinstance(m.data, array) for m in ms)
+
+def _blocks(n):
+    size = max(PARALLEL_MIN_BLOCK, -(-n // PARALLEL_WORKERS))
+    return [(i, min(i + size, n)) for i in range(0, n, size)]
+
+def _share(n, data=None): # shared block of n doubles, operands go to the workers by name instead of pickled
+    shm = SharedMemory(create=True, size=max(8 * n, 8))
+    if data is not None:
+        shm.buf[:8 * n] = data.tobytes()
+    return shm
+
+def _attach(name, start, stop): # doubles [start, stop) of a shared block, copied into an array
+    shm = SharedMemory(name=name)
+    a = array('d')
+    with shm.buf[8 * start:8 * stop] as b:
+        a.frombytes(b)
+    shm.close()
+    return a
+
+def _store(name, start, data):
+    shm = SharedMemory(name=name)
+    shm.buf[8 * start:8 * (start + len(data))] = data.tobytes()
+    shm.close()
+
+def _run_parallel(task, shared, out_size, blocks, *args):
+    # runs task(*shared names, out name, *args, start, stop) for every block, returns the output block
+    shms = [_share(len(d), d) for d in shared] + [_share(out_size)]
+    try:
+        with ProcessPoolExecutor(PARALLEL_WORKERS) as ex:
+            names = [shm.name for shm in shms]
+            for f in [ex.submit(task, *names, *args, i, j) for i, j in blocks]:
+                f.result()
+        return _attach(shms[-1].name, 0, out_size)
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+def _mul_task(a_name, bt_name, out_name, ac, bc, r0, r1):
+    a = _attach(a_name, r0 * ac, r1 * ac)
+    bt = _attach(bt_name, 0, bc * ac)
+    _store(out_name, r0 * bc, _matmul(a, bt, r1 - r0, ac, bc))
+
+def _inverse_task(l_name, u_name, out_name, n, perm, c0, c1):
+    lu = LU.__new__(LU)
+    lu.n, lu.perm = n, perm
+    lu.l = Mat._wrap(_attach(l_name, 0, n * n), n, n)
+    lu.u = Mat._wrap(_attach(u_name, 0, n * n), n, n)
+    xt = array('d')
+    for c in range(c0, c1):
+        e = array('d', bytes(8 * n))
+        e[c] = 1
+        xt.extend(lu._solve(e))
+    _store(out_name, c0 * n, xt)
+
+
+
+_POWERS = WeakKeyDictionary() # Mat -> (entries when cached, [m, m², m⁴, ...])
+
+def _squares(m):
+    # dropped and rebuilt as soon as the entries of m change
+    entry = _POWERS.get(m)
+    if entry is None or entry[0] != m.data:
+        entry = (m.data[:], [m.copy()]) # a copy, so the cache does not keep m alive
+        _POWERS[m] = entry
+    return entry[1]
+
+
+
+class _Row: # view of one row of a Mat, indexes straight into the flat buffer
+    __slots__ = ('mat', 'start', 'n')
+
+    def __init__(self, mat, start, n):
+        self.mat = mat
+        self.start = start
+        self.n = n
+
+    def _index(self, c):
+        if c < 0: c += self.n
+        if not 0 <= c < self.n:
+            raise IndexError('column index out of range')
+        return self.start + c
+
+    def __getitem__(self, c):
+        if isinstance(c, slice):
+            return list(self.mat.data[self.start:self.start + self.n][c])
+        return self.mat.data[self._index(c)]
+
+    def __setitem__(self, c, v):
+        m = self.mat
+        if isinstance(m.data, array) and not isinstance(v, _REALS):
+            m.data = list(m.data) # e.g. a Fraction, the matrix moves to list storage
+        m.data[self._index(c)] = v
+
+    def __eq__(self, other): # against any sequence, as the list rows used to
+        if not hasattr(other, '__len__'):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(self.mat.data[self.start:self.start + self.n])
+
+    def __repr__(self):
+        return str(list(self))
 
 
 
 class Mat:
     def __init__(self, m):
-        self.m = m
+        self.rows = len(m)
+        self.cols = len(m[0])
+        for r in m:
+            if len(r) != self.cols:
+                raise ValueError('rows of different length')
+        self.data = _pack([x for r in m for x in r])
+
+    @staticmethod
+    def _wrap(data, rows, cols):
+        m = Mat.__new__(Mat)
+        m.data = data
+        m.rows = rows
+        m.cols = cols
+        return m
+
+    @property
+    def m(self): # rows, kept for callers indexing m.m[r][c]
+        return self
+
+    def __getitem__(self, r):
+        if isinstance(r, slice):
+            return [self[i] for i in range(self.rows)[r]]
+        if r < 0: r += self.rows
+        if not 0 <= r < self.rows:
+            raise IndexError('row index out of range')
+        return _Row(self, r * self.cols, self.cols)
+
+    def __setitem__(self, r, row): # a whole row, m.m[r] = [...]
+        if r < 0: r += self.rows
+        if not 0 <= r < self.rows:
+            raise IndexError('row index out of range')
+        row = list(row)
+        if len(row) != self.cols:
+            raise ValueError('rows of different length')
+        if isinstance(self.data, array) and not all(isinstance(x, _REALS) for x in row):
+            self.data = list(self.data)
+        d = self.data
+        d[r * self.cols:(r + 1) * self.cols] = array('d', row) if isinstance(d, array) else row
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for r in range(self.rows):
+            yield _Row(self, r * self.cols, self.cols)
 
     def size(self):
-        return len(self.m), len(self.m[0]) # rows, cols
+        return self.rows, self.cols
     
     def transpose(self):
-        rs, cs = self.size()
-        return Mat([[self.m[r][c]  for r in range(rs)] for c in range(cs)])
+        if _use_np(self):
+            return _from_np(_to_np(self).T)
+        d, rs, cs = self.data, self.rows, self.cols
+        t = array('d') if isinstance(d, array) else []
+        for c in range(cs):
+            t.extend(d[c::cs])
+        return Mat._wrap(t, cs, rs)
     
     def col(self, i):
-        rs, _ = self.size()
-        return [self.m[r][i] for r in range(rs)]
+        return list(self.data[i::self.cols])
     
     def copy(self):
-        return Mat([[x for x in r] for r in self.m])
+        return Mat._wrap(self.data[:], self.rows, self.cols)
     
     def flip(self):
-        return Mat([r[::-1] for r in self.m[::-1]])
+        return Mat._wrap(self.data[::-1], self.rows, self.cols)
     
     @staticmethod
     def unit(n):
-        return Mat([[int(i == j) for j in range(n)] for i in range(n)])
+        d = [0] * (n * n)
+        d[::n + 1] = [1] * n
+        return Mat._wrap(d, n, n)
 
     @staticmethod
     def all(v, n, m):
-        return Mat([[v for _ in range(m)] for _ in range(n)])
+        return Mat._wrap(_pack([v]) * (n * m), n, m)
 
     @staticmethod
     def zeros(n, m):
@@ -40,61 +273,117 @@ class Mat:
     
     def __repr__(self):
         s = ''
-        for r in self.m:
+        for r in self:
             s += f"[{' '.join(str(x) for x in r)}]\n"
         return s[:-1]
     
     def __add__(self, other):
-        ar, ac = self.size()
-        br, bc = other.size()
-        if ar != br or ac != bc:
+        if isinstance(other, (Sparse, Lazy)):
+            return other + self
+        if self.size() != other.size():
             raise ValueError('size(a) != size(b)')
-        return Mat([[self.m[r][c] + other.m[r][c] for c in range(ac)] for r in range(ar)])
+        if _use_np(self, other):
+            return _from_np(_to_np(self) + _to_np(other))
+        return Mat._wrap(_zip(add, self.data, other.data), self.rows, self.cols)
 
     def __sub__(self, other):
-        ar, ac = self.size()
-        br, bc = other.size()
-        if ar != br or ac != bc:
+        if isinstance(other, Lazy):
+            return NotImplemented
+        if isinstance(other, Sparse):
+            return self + -other
+        if self.size() != other.size():
             raise ValueError('size(a) != size(b)')
-        return Mat([[self.m[r][c] - other.m[r][c] for c in range(ac)] for r in range(ar)])
+        if _use_np(self, other):
+            return _from_np(_to_np(self) - _to_np(other))
+        return Mat._wrap(_zip(sub, self.data, other.data), self.rows, self.cols)
     
     def __mul__(self, other):
-        if isinstance(other, (int, float)):
-            return Mat([[x * other for x in r] for r in self.m])
+        if isinstance(other, Sparse):
+            return other.__rmul__(self)
+        if isinstance(other, Lazy):
+            return self * other.eval()
+        if not isinstance(other, Mat):
+            if isinstance(other, _REALS) and _use_np(self):
+                return _from_np(_to_np(self) * other)
+            return Mat._wrap(_scale(self.data, other), self.rows, self.cols)
         ar, ac = self.size()
         br, bc = other.size()
         if ac != br:
             raise ValueError('cols(a) != rows(b)')
-        return Mat([[dot(self.m[r], other.col(c)) for c in range(bc)] for r in range(ar)])
+        if _use_np(self, other):
+            return _from_np(_to_np(self) @ _to_np(other))
+        if _use_parallel(ar, self, other):
+            bt = other.transpose().data
+            return Mat._wrap(_run_parallel(_mul_task, [self.data, bt], ar * bc, _blocks(ar), ac, bc), ar, bc)
+        return Mat._wrap(_matmul(self.data, other.transpose().data, ar, ac, bc), ar, bc)
 
     def __rmul__(self, other):
         return self * other
 
     def __pow__(self, other):
-        if not isinstance(other, int):
+        return self.pow(other)
+
+    def pow(self, k, cache=False):
+        # square and multiply; cache=True keeps self, self², self⁴, ... for later calls on the same matrix
+        if not isinstance(k, int):
             raise ValueError('exponent must be int')
-        if other < 0:
+        if k < 0:
             raise ValueError('negative exponent')
         rs, cs = self.size()
         if rs != cs:
             raise ValueError('Rows != Cols')
-        if other == 0:
+        if k == 0:
             return Mat.unit(rs)
-        m = self.copy()
-        for _ in range(other - 1):
-            m *= self
-        return m
+        if _use_np(self) and not cache:
+            return _from_np(np.linalg.matrix_power(_to_np(self), k))
+        sq = _squares(self) if cache else [self]
+        result = None
+        i = 0
+        while True:
+            if i == len(sq):
+                sq.append(sq[-1] * sq[-1])
+            if k & 1:
+                result = sq[i].copy() if result is None else result * sq[i]
+            k >>= 1
+            if not k:
+                return result
+            i += 1
+
+    def exact(self): # entries as Fractions; floats are taken at their exact binary value
+        return Mat._wrap([_to_fraction(x) for x in self.data], self.rows, self.cols)
+
+    def is_exact(self):
+        # Fractions (from exact()) with perhaps some ints; plain int matrices take the float paths as before
+        d = self.data
+        return not isinstance(d, array) and all(type(x) in (int, Fraction) for x in d) and any(type(x) == Fraction for x in d)
+
+    def det(self):
+        rs, cs = self.size()
+        if rs != cs:
+            raise ValueError('Rows != Cols')
+        try:
+            return bareiss(self)[0] if self.is_exact() else LU(self).det
+        except ValueError: # no pivot left, singular
+            return Fraction(0, 1) if self.is_exact() else 0.0
 
     def invert(self): # gauss
-        m = self.copy()
-        rs, cs = m.size()
+        rs, cs = self.size()
         if rs != cs:
             raise ValueError('Rows != Cols')
-        n = rs
-        b = Mat.unit(n)
-        m, b = gauss(m, b)
-        m, b = gauss(m.flip(), b.flip())
-        return b.flip()
+        if self.is_exact():
+            return bareiss(self)[1]
+        if _use_np(self):
+            try:
+                return _from_np(np.linalg.inv(_to_np(self)))
+            except np.linalg.LinAlgError: # same error as the pure python path
+                raise ValueError('singular matrix') from None
+        return LU(self).inverse()
+
+    def lu(self):
+        return LU(self)
+
+    def lazy(self):
+        return Lazy.of(self)
 
 class ColVec(Mat):
     def __init__(self, *v: float):
@@ -102,7 +391,7 @@ class ColVec(Mat):
 
     def __repr__(self):
         s = ''
-        for r in self.m:
+        for r in self:
             s += f"[{r[0]}]\n"
         return s[:-1]
 
@@ -112,37 +401,650 @@ class RowVec(Mat):
 
     def __repr__(self):
         s = ''
-        for r in self.m:
+        for r in self:
             s += f"[{' '.join(str(x) for x in r)}]\n"
         return s[:-1]
 
 
+
+class Sparse: # CSR matrix, rank-one terms u * vᵀ (e.g. a constant) are kept on the side instead of densified
+    def __init__(self, rows, cols, entries=()):
+        # entries: (r, c, v) triples in any order (COO form), duplicates are summed
+        acc = {}
+        for r, c, v in entries:
+            if not (0 <= r < rows and 0 <= c < cols):
+                raise IndexError('entry out of range')
+            k = r * cols + c
+            acc[k] = acc.get(k, 0) + v
+        keys = sorted(k for k, v in acc.items() if v != 0)
+        indptr = array('q', bytes(8 * (rows + 1)))
+        for k in keys:
+            indptr[k // cols + 1] += 1
+        for r in range(rows):
+            indptr[r + 1] += indptr[r]
+        self.rows = rows
+        self.cols = cols
+        self.indptr = indptr # row r is stored at indices/values[indptr[r]:indptr[r + 1]]
+        self.indices = array('q', [k % cols for k in keys])
+        self.values = _pack([acc[k] for k in keys])
+        self.outer = [] # [(u, v), ...], each adding u * vᵀ
+
+    @staticmethod
+    def _wrap(rows, cols, indptr, indices, values, outer):
+        s = Sparse.__new__(Sparse)
+        s.rows, s.cols = rows, cols
+        s.indptr, s.indices, s.values = indptr, indices, values
+        s.outer = outer
+        return s
+
+    @staticmethod
+    def from_mat(m):
+        rs, cs = m.size()
+        d = m.data
+        return Sparse(rs, cs, ((k // cs, k % cs, x) for k, x in enumerate(d) if x != 0))
+
+    def to_mat(self):
+        rs, cs = self.size()
+        d = [0] * (rs * cs)
+        for r, c, v in self.coo():
+            d[r * cs + c] = v
+        m = Mat._wrap(_pack(d), rs, cs)
+        for u, v in self.outer:
+            m = m + Mat._wrap(_pack([x * y for x in u for y in v]), rs, cs)
+        return m
+
+    def coo(self): # stored entries as (r, c, v), row by row
+        ip, ix, vs = self.indptr, self.indices, self.values
+        for r in range(self.rows):
+            for k in range(ip[r], ip[r + 1]):
+                yield r, ix[k], vs[k]
+
+    def size(self):
+        return self.rows, self.cols
+
+    def nnz(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f'Sparse({self.rows}x{self.cols}, nnz={self.nnz()}, rank-one terms={len(self.outer)})'
+
+    def transpose(self):
+        t = Sparse(self.cols, self.rows, ((c, r, v) for r, c, v in self.coo()))
+        t.outer = [(v, u) for u, v in self.outer]
+        return t
+
+    def add_outer(self, u, v):
+        if len(u) != self.rows or len(v) != self.cols:
+            raise ValueError('len(u) != rows or len(v) != cols')
+        return Sparse._wrap(*self.size(), self.indptr, self.indices, self.values, self.outer + [(_pack(u), _pack(v))])
+
+    def __add__(self, other):
+        rs, cs = self.size()
+        if isinstance(other, Mat):
+            return self.to_mat() + other
+        if isinstance(other, Lazy):
+            return other + self
+        if not isinstance(other, Sparse): # constant added to every entry
+            return self.add_outer(_pack([other]) * rs, _pack([1]) * cs)
+        if self.size() != other.size():
+            raise ValueError('size(a) != size(b)')
+        s = Sparse(rs, cs, chain(self.coo(), other.coo()))
+        s.outer = self.outer + other.outer
+        return s
+
+    def __radd__(self, other):
+        return self + other
+
+    def __neg__(self):
+        return self * -1
+
+    def __sub__(self, other):
+        if isinstance(other, Mat):
+            return self.to_mat() - other
+        return self + -other
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        if isinstance(other, Mat): # sparse x dense
+            br, bc = other.size()
+            if self.cols != br:
+                raise ValueError('cols(a) != rows(b)')
+            bt = other.transpose().data
+            ct = []
+            for c in range(bc):
+                ct.extend(self.matvec(bt[c * br:(c + 1) * br]))
+            return Mat._wrap(_pack(ct), bc, self.rows).transpose()
+        if isinstance(other, Sparse):
+            return self * other.to_mat()
+        if not isinstance(other, (int, float)) and hasattr(other, '__len__'):
+            return self.matvec(other)
+        return Sparse._wrap(*self.size(), self.indptr, self.indices, _scale(self.values, other),
+                            [(_scale(u, other), v) for u, v in self.outer])
+
+    def __rmul__(self, other):
+        if isinstance(other, Mat): # dense x sparse, row by row
+            ar, ac = other.size()
+            if ac != self.rows:
+                raise ValueError('cols(a) != rows(b)')
+            d = other.data
+            out = []
+            for r in range(ar):
+                out.extend(self.vecmat(d[r * ac:(r + 1) * ac]))
+            return Mat._wrap(_pack(out), ar, self.cols)
+        if not isinstance(other, (int, float)) and hasattr(other, '__len__'):
+            return self.vecmat(other)
+        return self * other
+
+    def matvec(self, x): # self * x for a column vector given as a sequence
+        if len(x) != self.cols:
+            raise ValueError('len(x) != cols')
+        ip, ix, vs = self.indptr, self.indices, self.values
+        get = x.__getitem__
+        y = [sum(map(mul, vs[ip[r]:ip[r + 1]], map(get, ix[ip[r]:ip[r + 1]]))) for r in range(self.rows)]
+        for u, v in self.outer:
+            t = dot(v, x)
+            y = list(map(add, y, map(mul, u, repeat(t))))
+        return y
+
+    def vecmat(self, x): # x * self for a row vector given as a sequence
+        if len(x) != self.rows:
+            raise ValueError('len(x) != rows')
+        ip, ix, vs = self.indptr, self.indices, self.values
+        y = [0] * self.cols
+        for r in range(self.rows):
+            xr = x[r]
+            if xr == 0: continue
+            for k in range(ip[r], ip[r + 1]):
+                y[ix[k]] += vs[k] * xr
+        for u, v in self.outer:
+            t = dot(x, u)
+            y = list(map(add, y, map(mul, v, repeat(t))))
+        return y
+
+
+
+class Lazy: # deferred +, -, scalar *, transpose and flip; eval() computes every entry in one fused pass
+    def __init__(self, op, args, rows, cols):
+        self.op = op
+        self.args = args
+        self.rows = rows
+        self.cols = cols
+        self.value = None # the evaluated Mat, kept once computed
+
+    @staticmethod
+    def of(m):
+        if isinstance(m, Sparse): # leaves index a dense buffer
+            m = m.to_mat()
+        return m if isinstance(m, Lazy) else Lazy('mat', (m,), *m.size())
+
+    @staticmethod
+    def unit(n): # symbolic, never stored
+        return Lazy('unit', (), n, n)
+
+    @staticmethod
+    def all(v, n, m): # symbolic, never stored
+        return Lazy('all', (v,), n, m)
+
+    @staticmethod
+    def zeros(n, m):
+        return Lazy.all(0, n, m)
+
+    @staticmethod
+    def ones(n, m):
+        return Lazy.all(1, n, m)
+
+    def size(self):
+        return self.rows, self.cols
+
+    def _binary(self, op, other):
+        other = Lazy.of(other)
+        if self.size() != other.size():
+            raise ValueError('size(a) != size(b)')
+        return Lazy(op, (self, other), *self.size())
+
+    def __add__(self, other):
+        return self._binary('add', other)
+
+    def __radd__(self, other):
+        return Lazy.of(other) + self
+
+    def __sub__(self, other):
+        return self._binary('sub', other)
+
+    def __rsub__(self, other):
+        return Lazy.of(other) - self
+
+    def __mul__(self, other):
+        if isinstance(other, (Mat, Lazy, Sparse)): # a matrix product is not fused
+            return self.eval() * (other.eval() if isinstance(other, Lazy) else other)
+        return Lazy('scale', (other, self), *self.size())
+
+    def __rmul__(self, other):
+        return self * other
+
+    def __neg__(self):
+        return self * -1
+
+    def copy(self): # a fresh, mutable Mat
+        return self.eval().copy()
+
+    @property
+    def m(self): # rows of the value, read only; copy() first to assign entries
+        return self.eval()
+
+    def transpose(self):
+        return Lazy('transpose', (self,), self.cols, self.rows)
+
+    def flip(self):
+        return Lazy('flip', (self,), *self.size())
+
+    def _children(self, r, c, lines): # (node, row index, col index) this entry needs, index names set up in lines
+        op, args = self.op, self.args
+        if op in ('add', 'sub'):
+            return [(args[0], r, c), (args[1], r, c)]
+        if op == 'scale':
+            return [(args[1], r, c)]
+        if op == 'transpose':
+            return [(args[0], c, r)]
+        if op == 'flip':
+            ri, ci = f'i{len(lines)}', f'i{len(lines) + 1}'
+            lines += [f'{ri} = {self.rows - 1} - {r}', f'{ci} = {self.cols - 1} - {c}']
+            return [(args[0], ri, ci)]
+        return []
+
+    def _expr(self, r, c, kids, env): # python expression for entry (r, c), children by local name, leaves go into env
+        op, args = self.op, self.args
+        if op in ('mat', 'all', 'scale'):
+            name = f'v{len(env)}'
+            env[name] = args[0].data if op == 'mat' else args[0]
+            if op == 'mat':
+                return f'{name}[{r} * {self.cols} + {c}]'
+            return name if op == 'all' else f'{name} * {kids[0]}'
+        if op == 'unit':
+            return f'1 if {r} == {c} else 0'
+        if op in ('transpose', 'flip'):
+            return kids[0]
+        return f'{kids[0]} {"+" if op == "add" else "-"} {kids[1]}'
+
+    def _emit(self, lines, env): # one assignment per node, children first, without recursion; returns the result name
+        names, kids = {}, {}
+        stack = [(self, 'r', 'c')]
+        while stack:
+            node, r, c = stack[-1]
+            key = (id(node), r, c)
+            if key in names:
+                stack.pop()
+                continue
+            if key not in kids:
+                kids[key] = node._children(r, c, lines)
+                stack += kids[key]
+                continue
+            stack.pop()
+            name = names[key] = f't{len(names)}'
+            lines.append(f'{name} = {node._expr(r, c, [names[(id(k), kr, kc)] for k, kr, kc in kids[key]], env)}')
+        return names[(id(self), 'r', 'c')]
+
+    def eval(self):
+        if self.value is None:
+            env, lines = {}, []
+            out = self._emit(lines, env)
+            vs = env.values()
+            dense = all(isinstance(v, (array,) + _REALS) for v in vs) and any(isinstance(v, (array,) + _FLOATS) for v in vs)
+            start = "array('d')" if dense else '[]'
+            src = f'def f():\n    out = {start}\n    put = out.append\n' \
+                  f'    for r in range({self.rows}):\n        for c in range({self.cols}):\n' + \
+                  ''.join(f'            {line}\n' for line in lines) + f'            put({out})\n    return out\n'
+            env['array'] = array
+            exec(src, env)
+            self.value = Mat._wrap(_pack(env['f']()), self.rows, self.cols)
+        return self.value
+
+    def __getitem__(self, r):
+        return self.eval()[r]
+
+    def __iter__(self):
+        return iter(self.eval())
+
+    def __repr__(self):
+        return repr(self.eval())
+
+
+
+def _to_fraction(x):
+    if type(x) == Fraction:
+        return x
+    if type(x) == float:
+        return Fraction(*x.as_integer_ratio())
+    return Fraction(int(x))
+
+def _int_rows(m): # rows of an exact matrix scaled to integers, with the scale of every row
+    rs, cs = m.size()
+    rows, scales = [], []
+    for r in range(rs):
+        row = [_to_fraction(x) for x in m.data[r * cs:(r + 1) * cs]]
+        s = lcm(*(x.den for x in row))
+        rows.append([x.num * (s // x.den) for x in row])
+        scales.append(s)
+    return rows, scales
+
+def bareiss(m):
+    # fraction-free elimination on integers: every division is exact and entries stay minors of m,
+    # so there is no gcd work and no blow-up beyond the size of the determinant. returns det, inverse
+    rs, cs = m.size()
+    if rs != cs:
+        raise ValueError('Rows != Cols')
+    n = rs
+    a, scales = _int_rows(m)
+    for i in range(n): # augment with diag(scales), so the right half stays integer
+        a[i] += [0] * n
+        a[i][n + i] = scales[i]
+    sign = 1
+    prev = 1
+    for k in range(n):
+        p = next((i for i in range(k, n) if a[i][k] != 0), None)
+        if p is None:
+            raise ValueError('singular matrix')
+        if p != k:
+            a[k], a[p] = a[p], a[k]
+            sign = -sign
+        ak = a[k][k + 1:]
+        pk = a[k][k]
+        for i in range(k + 1, n):
+            ai = a[i]
+            f = ai[k]
+            if f == 0:
+                ai[k + 1:] = [pk * x // prev for x in ai[k + 1:]]
+            else:
+                ai[k + 1:] = [(pk * x - f * y) // prev for x, y in zip(ai[k + 1:], ak)]
+        prev = pk
+    d = prev # det of the row-scaled matrix, up to sign
+    # back substitution for d * inverse, which is an integer matrix, so these divisions are exact too
+    xt = []
+    for c in range(n):
+        x = [0] * n
+        for i in range(n - 1, -1, -1):
+            ai = a[i]
+            x[i] = (d * ai[n + c] - sum(map(mul, ai[i + 1:n], x[i + 1:]))) // ai[i]
+        xt.append(x)
+    det = Fraction(sign * d, prod(scales))
+    inv = [Fraction(xt[c][r], d) for r in range(n) for c in range(n)]
+    return det, Mat._wrap(inv, n, n)
+
+
+
 def dot(a, b):
-    return sum(i * j for i, j in zip(a, b))
+    return sum(map(mul, a, b))
+
+
+BLOCK = 64 # columns of the right operand kept hot while the rows of the left one stream past
 
+def _matmul(a, bt, ar, ac, bc, block=BLOCK): # a is ar x ac, bt is the transposed right operand (bc x ac)
+    arows = [a[r * ac:(r + 1) * ac] for r in range(ar)]
+    bcols = [bt[c * ac:(c + 1) * ac] for c in range(bc)]
+    dense = isinstance(a, array) and isinstance(bt, array)
+    out = array('d', bytes(8 * ar * bc)) if dense else [0] * (ar * bc)
+    for j0 in range(0, bc, block):
+        cols = bcols[j0:j0 + block]
+        j1 = j0 + len(cols)
+        for r in range(ar):
+            ra = arows[r]
+            tile = [sum(map(mul, ra, cb)) for cb in cols]
+            out[r * bc + j0:r * bc + j1] = array('d', tile) if dense else tile
+    return out if dense else _pack(out)
 
 
-def gauss(m, b):
-    m = m.copy()
-    b = b.copy()
+
+def _axpy(y, x, s): # y + x * s over two equally long slices of a buffer
+    if isinstance(y, array):
+        return array('d', map(add, y, map(mul, x, repeat(s))))
+    return list(map(add, y, map(mul, x, repeat(s))))
+
+def gauss(m, *bs, copy=True, perm=None):
+    # forward elimination with partial pivoting: m becomes unit upper triangular and every b in bs
+    # gets the same row operations in the same pass. copy=False reduces m and bs in place.
+    # perm, if a list is given, is filled with the original row index of every row of the result
+    mr, mc = m.size()
+    for b in bs:
+        if b.rows != mr:
+            raise ValueError('mr != br')
+    if copy:
+        m = m.copy()
+        bs = [b.copy() for b in bs]
+    order = list(range(mr))
+    if _use_np(m, *bs):
+        _gauss_np(m, bs, order)
+    else:
+        _gauss(m, bs, order)
+    if perm is not None:
+        perm[:] = order
+    return (m, *bs)
+
+def _swap(d, w, i, j):
+    d[i * w:(i + 1) * w], d[j * w:(j + 1) * w] = d[j * w:(j + 1) * w], d[i * w:(i + 1) * w]
+
+def _gauss(m, bs, order):
     mr, mc = m.size()
-    br, bc = b.size()
-    if mr != br:
-        raise ValueError('mr != br')
-    n = min(mr, mc)
-    for i in range(n):
-        for j in range(i + 1, n):
-            s = -m.m[j][i] / m.m[i][i] # scalar
-            for k in range(mc):
-                m.m[j][k] += m.m[i][k] * s
-            for k in range(bc):
-                b.m[j][k] += b.m[i][k] * s
-    for i in range(n):
-        s = m.m[i][i]
-        for k in range(mc):
-            m.m[i][k] /= s
-        for k in range(bc):
-            b.m[i][k] /= s
-    return m, b
+    md = m.data
+    bds = [(b.data, b.cols) for b in bs]
+    for i in range(min(mr, mc)):
+        p = max(range(i, mr), key=lambda j: abs(md[j * mc + i]))
+        piv = md[p * mc + i]
+        if piv == 0:
+            raise ValueError('singular matrix')
+        if p != i:
+            order[i], order[p] = order[p], order[i]
+            _swap(md, mc, i, p)
+            for bd, bc in bds:
+                _swap(bd, bc, i, p)
+        # columns left of i are already zero, so rows only need updating from column i on
+        ri = md[i * mc + i:(i + 1) * mc] = _scale(md[i * mc + i:(i + 1) * mc], 1 / piv)
+        bis = []
+        for bd, bc in bds:
+            bd[i * bc:(i + 1) * bc] = bi = _scale(bd[i * bc:(i + 1) * bc], 1 / piv)
+            bis.append(bi)
+        for j in range(i + 1, mr):
+            s = -md[j * mc + i]
+            if s == 0: continue
+            md[j * mc + i:(j + 1) * mc] = _axpy(md[j * mc + i:(j + 1) * mc], ri, s)
+            md[j * mc + i] = 0 # exact zero instead of rounding noise
+            for (bd, bc), bi in zip(bds, bis):
+                bd[j * bc:(j + 1) * bc] = _axpy(bd[j * bc:(j + 1) * bc], bi, s)
+
+def _gauss_np(m, bs, order): # same elimination as _gauss, one vectorized update per pivot, in place
+    mr, mc = m.size()
+    a = _to_np(m)
+    bs = [_to_np(b) for b in bs]
+    for i in range(min(mr, mc)):
+        p = i + int(np.argmax(np.abs(a[i:, i])))
+        piv = a[p, i]
+        if piv == 0:
+            raise ValueError('singular matrix')
+        if p != i:
+            order[i], order[p] = order[p], order[i]
+            a[[i, p]] = a[[p, i]]
+            for b in bs:
+                b[[i, p]] = b[[p, i]]
+        a[i, i:] /= piv
+        for b in bs:
+            b[i] /= piv
+        s = -a[i + 1:, i].copy()
+        a[i + 1:, i:] += np.outer(s, a[i, i:])
+        a[i + 1:, i] = 0
+        for b in bs:
+            b[i + 1:] += np.outer(s, b[i])
+
+
+
+def stationary(p, damping=None, tol=1e-10, max_iter=1000, x0=None):
+    # power iteration x <- damping * x * p + teleport for a row-stochastic Mat or Sparse p, no inversion.
+    # mass lost to dangling rows (and to damping) is spread evenly, so x keeps summing to 1.
+    # x0 warm-starts from a previous answer. returns x, iterations, residual (L1 change of the last step)
+    rs, cs = p.size()
+    if rs != cs:
+        raise ValueError('Rows != Cols')
+    n = rs
+    if isinstance(p, Sparse):
+        step = p.vecmat
+    else:
+        pt = p.transpose().data
+        cols = [pt[c * n:(c + 1) * n] for c in range(n)]
+        step = lambda x: [sum(map(mul, x, col)) for col in cols]
+    if x0 is None:
+        x = [1 / n] * n
+    else:
+        if len(x0) != n:
+            raise ValueError('len(x0) != n')
+        t = sum(x0)
+        x = [v / t for v in x0]
+    res = float('inf')
+    for it in range(1, max_iter + 1):
+        y = step(x)
+        if damping is not None:
+            y = [v * damping for v in y]
+        lost = (1 - sum(y)) / n
+        y = [v + lost for v in y]
+        res = sum(abs(a - b) for a, b in zip(x, y))
+        x = y
+        if res < tol:
+            return x, it, res
+    return x, max_iter, res
+
+
+
+def _eye(n): # float unit matrix, keeps the float paths on array storage
+    d = array('d', bytes(8 * n * n))
+    d[::n + 1] = array('d', [1.0]) * n
+    return Mat._wrap(d, n, n)
+
+class LU: # factor once with gauss, then every solve is O(n²)
+    def __init__(self, a):
+        rs, cs = a.size()
+        if rs != cs:
+            raise ValueError('Rows != Cols')
+        n = self.n = rs
+        self.perm = []
+        e = Mat.unit(n).exact() if a.is_exact() else _eye(n)
+        self.u, t = gauss(a, e, perm=self.perm) # t * a == u, u unit upper triangular
+        # t holds the row swaps as well; with its columns put back in pivot order it is lower triangular
+        td = t.data
+        self.l = Mat._wrap(_pack([td[r * n + p] for r in range(n) for p in self.perm]), n, n)
+
+    def _solve(self, y): # one right-hand side as a flat sequence
+        n, l, u = self.n, self.l.data, self.u.data
+        y = [y[p] for p in self.perm]
+        z = [sum(map(mul, l[i * n:i * n + i + 1], y[:i + 1])) for i in range(n)]
+        x = [0] * n
+        for i in range(n - 1, -1, -1):
+            x[i] = z[i] - sum(map(mul, u[i * n + i + 1:(i + 1) * n], x[i + 1:]))
+        return x
+
+    def solve(self, b):
+        # b is a Mat with n rows (one system per column) or a plain sequence of n numbers
+        if not isinstance(b, Mat):
+            if len(b) != self.n:
+                raise ValueError('len(b) != n')
+            return self._solve(list(b))
+        br, bc = b.size()
+        if br != self.n:
+            raise ValueError('rows(b) != n')
+        bt = b.transpose().data
+        xt = []
+        for c in range(bc):
+            xt.extend(self._solve(bt[c * br:(c + 1) * br]))
+        return Mat._wrap(_pack(xt), bc, br).transpose()
+
+    @property
+    def det(self):
+        n, l = self.n, self.l.data
+        seen = [False] * n
+        cycles = 0
+        for i in range(n): # sign of the pivot permutation is (-1)^(n - cycles)
+            if seen[i]: continue
+            cycles += 1
+            j = i
+            while not seen[j]:
+                seen[j] = True
+                j = self.perm[j]
+        return (-1)**(n - cycles) * prod(1 / l[i * n + i] for i in range(n)) # diagonal of l holds the inverted pivots
+
+    def inverse(self):
+        n = self.n
+        if _use_parallel(n, self.l, self.u): # columns of the inverse are independent solves
+            xt = _run_parallel(_inverse_task, [self.l.data, self.u.data], n * n, _blocks(n), n, self.perm)
+            return Mat._wrap(xt, n, n).transpose()
+        return self.solve(Mat.unit(n).exact() if self.u.is_exact() else _eye(n))
+
+
 
+def _hessenberg(h): # in place similarity reduction to upper hessenberg form, gaussian elimination with pivoting
+    n = len(h)
+    for m in range(1, n - 1):
+        i = max(range(m, n), key=lambda j: abs(h[j][m - 1]))
+        if h[i][m - 1] == 0: continue
+        if i != m:
+            h[i], h[m] = h[m], h[i]
+            for r in h: r[i], r[m] = r[m], r[i]
+        for j in range(m + 1, n):
+            t = h[j][m - 1] / h[m][m - 1]
+            if t == 0: continue
+            h[j] = [x - t * y for x, y in zip(h[j], h[m])]
+            for r in h: r[m] += t * r[j]
 
+def eigvals(a, tol=1e-14, max_iter=None):
+    # all eigenvalues of a square Mat as complex numbers: hessenberg form, then QR steps with wilkinson
+    # shifts and givens rotations, O(n²) each, deflating eigenvalues off the bottom of the active window
+    rs, cs = a.size()
+    if rs != cs:
+        raise ValueError('Rows != Cols')
+    if _use_np(a):
+        try:
+            return [complex(x) for x in np.linalg.eigvals(_to_np(a))]
+        except np.linalg.LinAlgError:
+            raise ValueError('no convergence') from None
+    n = rs
+    h = [[complex(x) for x in r] for r in a]
+    _hessenberg(h)
+    max_iter = 30 * n if max_iter is None else max_iter
+    out = []
+    hi, it, total = n - 1, 0, 0
+    while hi >= 0:
+        lo = hi
+        while lo > 0 and abs(h[lo][lo - 1]) > tol * (abs(h[lo][lo]) + abs(h[lo - 1][lo - 1])):
+            lo -= 1
+        if lo == hi: # h[hi][hi] split off
+            out.append(h[hi][hi])
+            hi, it = hi - 1, 0
+            continue
+        total += 1
+        if total > max_iter:
+            raise ValueError('no convergence')
+        a_, b_, c_, d_ = h[hi - 1][hi - 1], h[hi - 1][hi], h[hi][hi - 1], h[hi][hi]
+        disc = csqrt((a_ - d_) * (a_ - d_) / 4 + b_ * c_)
+        mu = min((a_ + d_) / 2 + disc, (a_ + d_) / 2 - disc, key=lambda z: abs(z - d_)) # eigenvalue of the corner nearer h[hi][hi]
+        it += 1
+        if it % 10 == 0: # exceptional shift against cycling
+            mu += abs(h[hi][hi - 1])
+        for k in range(lo, hi + 1):
+            h[k][k] -= mu
+        rots = []
+        for k in range(lo, hi): # h - mu = qr, rows rotated into r
+            x, y = h[k][k], h[k + 1][k]
+            r = (abs(x)**2 + abs(y)**2)**0.5
+            c, s = (x / r, y / r) if r else (1, 0)
+            rk, rk1 = h[k], h[k + 1]
+            for j in range(k, hi + 1):
+                p, q = rk[j], rk1[j]
+                rk[j] = c.conjugate() * p + s.conjugate() * q
+                rk1[j] = c * q - s * p
+            rots.append((c, s))
+        for k, (c, s) in enumerate(rots, lo): # rq, columns rotated back
+            for i in range(lo, min(k + 2, hi) + 1):
+                row = h[i]
+                p, q = row[k], row[k + 1]
+                row[k] = p * c + q * s
+                row[k + 1] = q * c.conjugate() - p * s.conjugate()
+        for k in range(lo, hi + 1):
+            h[k][k] += mu
+    return out
@@ -1,53 +1,170 @@
+from collections import OrderedDict
+from itertools import repeat
+from cmath import exp as cexp
+from math import pi
+from operator import add, mul, sub
+
+from dual import Dual, HyperDual
+from matrix import Mat, eigvals
+
+
 
 class Function:
-    def __init__(self, f):
+    def __init__(self, f, batch=None, cache=None):
         self.f = f
+        self.batch = batch # f over a whole list at once, set on composed functions
+        self.cache = OrderedDict() if cache else None # last `cache` values by x, least recently used dropped
+        self.cache_size = cache
         self.dx = 0.00001
         self.a = -10
         self.b = 10
+        self.tol = 1e-9
+        self.evals = 0 # calls to value, lets callers weigh accuracy against work
+        self.exact = None # whether f takes dual numbers, found out on the first slope
 
     def value(self, x):
-        return self.f(x)
+        if self.cache is None or isinstance(x, (Dual, HyperDual)):
+            self.evals += 1
+            return self.f(x)
+        if x in self.cache:
+            self.cache.move_to_end(x)
+            return self.cache[x]
+        self.evals += 1
+        y = self.cache[x] = self.f(x)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return y
+
+    def values(self, xs): # value at every x, a composed chain is walked once for the whole list
+        xs = list(xs)
+        if self.batch is None or self.cache is not None:
+            return [self.value(x) for x in xs]
+        self.evals += len(xs)
+        return self.batch(xs)
 
     def __add__(self, other):
-        return Function(lambda x: self.value(x) + other.value(x))
+        return Function(lambda x: self.value(x) + other.value(x),
+                        lambda xs: list(map(add, self.values(xs), other.values(xs))))
     
     def __sub__(self, other):
-        return Function(lambda x: self.value(x) - other.value(x))
+        return Function(lambda x: self.value(x) - other.value(x),
+                        lambda xs: list(map(sub, self.values(xs), other.values(xs))))
     
     def __mul__(self, other):
-        return Function(lambda x: self.value(x) * other.value(x))
+        return Function(lambda x: self.value(x) * other.value(x),
+                        lambda xs: list(map(mul, self.values(xs), other.values(xs))))
     
     def __pow__(self, other):
-        return Function(lambda x: self.value(x)**other)
+        return Function(lambda x: self.value(x)**other,
+                        lambda xs: [y**other for y in self.values(xs)])
+
+    def _dual(self, x): # f at a dual number, None if f only works on plain numbers
+        if self.exact is False:
+            return None
+        try:
+            y = self.f(x)
+        except TypeError: # math functions, float() and the like on the argument
+            self.exact = False
+            return None
+        self.exact = True
+        return y
+
+    def slope(self, x): # exact through dual numbers when f allows it, central difference with dx otherwise
+        y = self._dual(Dual(x, 1))
+        if y is not None:
+            return y.b if isinstance(y, Dual) else 0
+        return (self.f(x + self.dx) - self.f(x - self.dx)) / (2 * self.dx)
+
+    def slope2(self, x): # second derivative, exact through hyper-dual numbers, central difference otherwise
+        y = self._dual(HyperDual(x, 1, 1))
+        if y is not None:
+            return y.d if isinstance(y, HyperDual) else 0
+        dx = self.dx**0.5
+        return (self.f(x + dx) - 2 * self.f(x) + self.f(x - dx)) / (dx * dx)
+
+    def slopes(self, xs):
+        if self.exact is not False:
+            return [self.slope(x) for x in xs]
+        dx = self.dx
+        return [(y1 - y0) / (2 * dx) for y0, y1 in zip(self.values([x - dx for x in xs]), self.values([x + dx for x in xs]))]
 
     def derivative(self):
-        return Function(lambda x: (self.f(x + self.dx) - self.f(x)) / self.dx)
+        return Function(self.slope, self.slopes)
+
+    def second_derivative(self):
+        return Function(self.slope2, lambda xs: [self.slope2(x) for x in xs])
     
     def integral(self, a, b):
-        sum = 0
-        x = a
-        while x < b:
-            sum += self.f(x) * self.dx
-            x += self.dx
-        return sum
+        return self.quad(a, b)[0]
+
+    def quad(self, a, b, tol=None, max_depth=50, rtol=1e-10, max_evals=200000):
+        # adaptive simpson: intervals are halved only where the local error estimate is above
+        # their share of tol, or above rtol of their own value. works level by level, so each level
+        # is one values() call. a level that would go past max_evals is not evaluated, its intervals
+        # keep their estimate from the level before. returns the integral and an estimate of its error
+        tol = self.tol if tol is None else tol
+        fa, fm, fb = self.values([a, (a + b) / 2, b])
+        level = [(a, b, fa, fm, fb, (b - a) / 6 * (fa + 4 * fm + fb), float('inf'))]
+        total = err = 0
+        evals = 3
+        for depth in range(max_depth + 1):
+            if evals + 2 * len(level) > max_evals: # out of budget
+                total += sum(lv[5] for lv in level)
+                err += sum(lv[6] for lv in level)
+                break
+            evals += 2 * len(level)
+            ys = self.values([p for a, b, *_ in level for p in ((3 * a + b) / 4, (a + 3 * b) / 4)])
+            deeper = []
+            for i, (a, b, fa, fm, fb, whole, _) in enumerate(level):
+                m = (a + b) / 2
+                flm, frm = ys[2 * i], ys[2 * i + 1]
+                left = (m - a) / 6 * (fa + 4 * flm + fm)
+                right = (b - m) / 6 * (fm + 4 * frm + fb)
+                delta = left + right - whole
+                if abs(delta) <= 15 * max(tol, rtol * abs(whole)) or depth == max_depth:
+                    total += left + right + delta / 15 # richardson correction
+                    err += abs(delta) / 15
+                else:
+                    e = abs(delta) / 30 # each half's share of this estimate
+                    deeper += [(a, m, fa, flm, fm, left, e), (m, b, fm, frm, fb, right, e)]
+            if not deeper:
+                break
+            level = deeper
+            tol /= 2
+        return total, err
     
     def tangent(self, x):
         k = self.derivative().value(x)
         m = self.value(x) - k * x
         return Function(lambda x: k * x + m)
     
-    def zero(self):
-        xs = []
-        x = self.a + self.dx
-        prev_y = self.value(self.a)
-        while x <= self.b:
-            y = self.value(x)
-            if sign(prev_y) != sign(y) or y == 0:
-                xs.append(x)
-            x += self.dx
-            prev_y = y
-        return xs
+    def zero(self, n=2000, tol=1e-12, max_roots=None):
+        # coarse scan of n steps over [a, b], every sign change refined with brent.
+        # roots that touch zero without changing sign are only found if they land on the grid
+        xs = [self.a + (self.b - self.a) * i / n for i in range(n + 1)]
+        ys = self.values(xs)
+        roots = []
+        for i in range(n + 1):
+            if max_roots is not None and len(roots) >= max_roots: break
+            if ys[i] == 0:
+                r = xs[i]
+            elif i < n and ys[i + 1] != 0 and (ys[i] < 0) != (ys[i + 1] < 0):
+                r = brent(self.value, xs[i], xs[i + 1], ys[i], ys[i + 1], tol)
+            else:
+                continue
+            if not roots or r - roots[-1] > 2 * tol * max(1, abs(r)): # neighbours of one root
+                roots.append(r)
+        return roots
+    
+    def newton(self, x, tol=1e-12, max_iter=50): # one root near x, value and slope from one dual evaluation
+        for _ in range(max_iter):
+            y = self._dual(Dual(x, 1))
+            y, k = (y.a, y.b) if isinstance(y, Dual) else (self.value(x), self.slope(x))
+            if k == 0: break
+            step = y / k
+            x -= step
+            if abs(step) <= tol * max(1, abs(x)): break
+        return x
     
     def intersect(self, other):
         return (self - other).zero()
@@ -90,8 +207,37 @@ class Polynom:
             result[e + 1] = c / (e + 1)
         return Polynom(result)
     
+    def terms(self): # nonzero (exponent, coefficient) from the top down, re-sorted only after pol changes
+        if self.__dict__.get('_src') != self.pol:
+            self._src = dict(self.pol)
+            self._desc = sorted(((e, c) for e, c in self.pol.items() if c != 0), reverse=True)
+            self._plain = all(type(e) == int and e >= 0 for e, _ in self._desc)
+        return self._desc
+
     def value(self, x):
-        return sum(self.pol[e] * x**e for e in self.pol)
+        terms = self.terms()
+        if not self._plain:
+            return sum(c * x**e for e, c in terms)
+        r = 0
+        prev = terms[0][0] if terms else 0
+        for e, c in terms: # horner, a gap between exponents is one power of x
+            g = prev - e
+            r = (r * x if g == 1 else r * x**g) + c
+            prev = e
+        return r * x**prev if prev else r
+
+    def values(self, xs): # horner over all points at once, one pass per term
+        terms = self.terms()
+        xs = list(xs)
+        if not self._plain:
+            return [self.value(x) for x in xs]
+        r = [0] * len(xs)
+        prev = terms[0][0] if terms else 0
+        for e, c in terms:
+            g = prev - e
+            r = list(map(add, map(mul, r, xs if g == 1 else [x**g for x in xs]), repeat(c)))
+            prev = e
+        return list(map(mul, r, [x**prev for x in xs])) if prev else r
     
     def integral(self, a, b):
         prim = self.primitive()
@@ -116,42 +262,86 @@ class Polynom:
             b = b**0.5
             return [a + b, a - b]
         
-        # heltalspolynom
-        for c in self.pol.values():
-            if c % 1 != 0:
-                break
+        return self.real_roots()
+
+    def coefs(self): # dense coefficients from the highest power down
+        deg = self.deg()
+        if any(c != 0 and (type(e) != int or e < 0) for e, c in self.pol.items()):
+            raise ValueError('not a polynomial')
+        return [self.coef(e) for e in range(deg, -1, -1)]
+
+    def companion(self): # Mat whose eigenvalues are the roots, upper hessenberg already
+        cs = self.coefs()
+        n = len(cs) - 1
+        return Mat([[1 if r == c + 1 else 0 for c in range(n - 1)] + [-cs[n - r] / cs[0]] for r in range(n)])
+
+    def roots(self, method='aberth', tol=1e-12, max_iter=500):
+        # every root, complex ones included, repeated by multiplicity. 'aberth' iterates all roots at once,
+        # O(n²) per sweep; 'companion' takes the eigenvalues of the companion matrix
+        cs = self.coefs()
+        zeros = 0
+        while len(cs) > 1 and cs[-1] == 0: # roots at 0 split off exactly
+            cs.pop()
+            zeros += 1
+        if len(cs) == 1: return [0j] * zeros
+        if method == 'aberth':
+            rs = aberth(cs, tol, max_iter)
+        elif method == 'companion':
+            rs = eigvals(Polynom({len(cs) - 1 - i: c for i, c in enumerate(cs)}).companion())
         else:
-            ps = divisors(self.pol[0])
-            qs = divisors(self.pol[deg])
-            for p in ps:
-                for q in qs:
-                    x = p / q
-                    if self.value(x) == 0: return [x] + (self / Polynom({1: 1, 0: -x}))[0].zero()
-                    if self.value(-x) == 0: return [-x] + (self / Polynom({1: 1, 0: x}))[0].zero()
-        
-        
-        for guess in range(-15, 15): # guesses
-            if self.value(guess) == 0:
-                return [guess] + (self / Polynom({1: 1, 0: -guess}))[0].zero()
-        
-        l = -15
-        for r in range(-15, 15): # guesses
-            ry = self.value(r)
-            ly = self.value(l)
-            if ly < 0 and ry > 0 or ry < 0 and ly > 0: break
-            l = r
-        else: return []
-        while l < r:
-            m = (l + r) / 2
-            my = self.value(m)
-            if abs(my) <= 0.000001: break
-            ly = self.value(l)
-            ry = self.value(r)
-            if my > 0 and ry > 0 or my < 0 and ry < 0: r = m
-            else: l = m
-        return [m] + (self / Polynom({1: 1, 0: -m}))[0].zero()
-
-        return [] # could not find
+            raise ValueError(f'unknown method {method}')
+        return [0j] * zeros + rs
+
+    def real_roots(self, tol=1e-7, method='aberth', cluster=1e-2):
+        # real parts of the real roots, sorted and repeated by multiplicity. a root of multiplicity m
+        # comes out as a ring of m approximations about eps^(1/m) wide, so roots within cluster (relative)
+        # of each other are grouped: a group whose members are all real is kept member by member,
+        # otherwise its mean is refined by newton on the (m-1)th derivative, where the root is simple.
+        # the group counts as m times that root only if it is real, p and its first m-1 derivatives
+        # vanish there and the group is no wider than an m-fold root would spread
+        zs = self.roots(method)
+        group = list(range(len(zs)))
+        def find(i):
+            while group[i] != i:
+                i = group[i] = group[group[i]]
+            return i
+        for i, zi in enumerate(zs):
+            for j in range(i + 1, len(zs)):
+                if abs(zi - zs[j]) <= cluster * max(1, abs(zi)):
+                    group[find(j)] = find(i)
+        groups = {}
+        for i, z in enumerate(zs):
+            groups.setdefault(find(i), []).append(z)
+        real = lambda z: abs(z.imag) <= tol * max(1, abs(z))
+        result = []
+        for g in groups.values():
+            if all(map(real, g)):
+                result += [z.real for z in g]
+                continue
+            m = len(g)
+            ds = [self]
+            for _ in range(m):
+                ds.append(ds[-1].derivative())
+            d, dd = ds[m - 1], ds[m]
+            c = sum(g) / m
+            for _ in range(50):
+                k = dd.value(c)
+                if k == 0: break
+                step = d.value(c) / k
+                c -= step
+                if abs(step) <= 1e-15 * max(1, abs(c)): break
+            x = c.real
+            scale = lambda p: sum(abs(a) * abs(x)**e for e, a in p.pol.items()) or 1
+            spread = max(abs(z - c) for z in g)
+            if real(c) and spread <= 100 * 2.2e-16**(1 / m) * max(1, abs(x)) \
+                    and all(abs(p.value(x)) <= 1e-10 * scale(p) for p in ds[:m - 1]):
+                result += [x] * m
+            else: # not a multiple root, real members of the group still count
+                result += [z.real for z in g if real(z)]
+        for i, x in enumerate(result):
+            n = round(x) # exact integer roots stay exact, when x is that integer up to rounding
+            if abs(x - n) <= 1e-12 * max(1, abs(x)) and self.value(n) == 0: result[i] = float(n)
+        return sorted(result)
 
     def intersect(self, other):
         p = self - other
@@ -236,6 +426,83 @@ class Polynom:
 def sign(x):
     return -1 if x < 0 else 1
 
+def brent(f, a, b, fa=None, fb=None, tol=1e-12, max_iter=100):
+    # root of f in [a, b] where f(a) and f(b) differ in sign: inverse quadratic / secant steps,
+    # falling back to bisection whenever they do not shrink the bracket fast enough
+    fa = f(a) if fa is None else fa
+    fb = f(b) if fb is None else fb
+    if fa == 0: return a
+    if fb == 0: return b
+    if (fa < 0) == (fb < 0):
+        raise ValueError('root not bracketed')
+    if abs(fa) < abs(fb):
+        a, b, fa, fb = b, a, fb, fa
+    c, fc = a, fa
+    d = c
+    bisected = True
+    for _ in range(max_iter):
+        if fb == 0 or abs(b - a) <= tol:
+            return b
+        if fa != fc and fb != fc:
+            s = a * fb * fc / ((fa - fb) * (fa - fc)) + b * fa * fc / ((fb - fa) * (fb - fc)) + c * fa * fb / ((fc - fa) * (fc - fb))
+        else:
+            s = b - fb * (b - a) / (fb - fa)
+        lo, hi = sorted(((3 * a + b) / 4, b))
+        if not lo < s < hi or \
+                (bisected and abs(s - b) >= abs(b - c) / 2) or (not bisected and abs(s - b) >= abs(c - d) / 2) or \
+                (bisected and abs(b - c) < tol) or (not bisected and abs(c - d) < tol):
+            s = (a + b) / 2
+            bisected = True
+        else:
+            bisected = False
+        fs = f(s)
+        d, c, fc = c, b, fb
+        if (fa < 0) != (fs < 0):
+            b, fb = s, fs
+        else:
+            a, fa = s, fs
+        if abs(fa) < abs(fb):
+            a, b, fa, fb = b, a, fb, fa
+    return b
+
+def _newton_ratio(cs, rcs, z): # p(z) / p'(z), through the reversed polynomial at 1/z when |z| > 1 to stay in range
+    n = len(cs) - 1
+    if abs(z) <= 1:
+        p, dp = cs[0], 0
+        for c in cs[1:]:
+            dp = dp * z + p
+            p = p * z + c
+        return p / dp if dp else p
+    w = 1 / z
+    q, dq = rcs[0], 0
+    for c in rcs[1:]:
+        dq = dq * w + q
+        q = q * w + c
+    d = n * q - w * dq # p(z) = z^n q(w), p'(z) = z^(n-1) (n q(w) - w q'(w))
+    return z * q / d if d else q
+
+def aberth(cs, tol=1e-12, max_iter=500):
+    # all roots of the polynomial with coefficients cs (highest power first, cs[-1] != 0) at once.
+    # each approximation moves by the newton step corrected for all the others,
+    # w / (1 - w * sum 1 / (z_i - z_j)), which is O(n²) per sweep; finished roots are frozen.
+    # starts on a circle of radius |cs[-1] / cs[0]|^(1/n), the geometric mean of the root moduli
+    n = len(cs) - 1
+    rcs = cs[::-1]
+    r = abs(cs[-1] / cs[0])**(1 / n)
+    zs = [r * cexp(1j * (2 * pi * k / n + 0.4)) for k in range(n)]
+    todo = set(range(n))
+    for _ in range(max_iter):
+        for i in list(todo):
+            zi = zs[i]
+            w = _newton_ratio(cs, rcs, zi)
+            s = sum(1 / (zi - zj) for j, zj in enumerate(zs) if j != i and zj != zi)
+            step = w / (1 - w * s)
+            zs[i] = zi - step
+            if abs(step) <= tol * abs(zs[i]) or w == 0:
+                todo.discard(i)
+        if not todo: break
+    return zs
+
 def line_fit(pts):
     mx = 0
     my = 0